@@ -2,23 +2,63 @@
 
 """Main Lifesaver bot classes."""
 
+import asyncio
+import compileall
+import contextlib
+import importlib
+import importlib.util
 import logging
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Callable, Iterable, Optional, Union, TYPE_CHECKING
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Union,
+    TYPE_CHECKING,
+)
 
+import aiohttp
 import discord
 from discord.ext import commands
 
 import lifesaver
-from lifesaver.load_list import LoadList
+from lifesaver.load_list import LoadList, manifest_path, scan_imports
 from lifesaver.poller import Poller, PollerPlug
-from lifesaver.utils import dot_access
+from lifesaver.profiling import StartupProfiler
+from lifesaver.config import ConfigError
+from lifesaver.http import CachedSession
+from lifesaver.utils import flatten_dict, memory_usage
+from lifesaver.utils.timing import Timer, format_seconds
 
+from .concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
 from .config import BotConfig
+from .intents import MEMBER_CACHE_INTENTS, IntentsReport, derive_intents
+from .lazy import LazyExtensions
+from .metrics import CommandMetrics
+from .pool import InstrumentedPool
+from .processes import ProcessPool
+from .prefix import (
+    MISSING,
+    GuildPrefixes,
+    PostgresGuildPrefixBackend,
+    PrefixMatcher,
+    StorageGuildPrefixBackend,
+)
+from .scheduler import Scheduler
+from .storage import AsyncJSONStorage
 
 if TYPE_CHECKING:
     BB = commands.bot.BotBase[lifesaver.Context]
-    import asyncpg
+
+    from lifesaver.cluster import ClusterClient
 else:
     BB = commands.bot.BotBase
 
@@ -26,6 +66,7 @@ INCLUDED_EXTENSIONS = [
     "jishaku",
     "lifesaver.bot.exts.health",
     "lifesaver.bot.exts.errors",
+    "lifesaver.bot.exts.metrics",
 ]
 
 
@@ -49,6 +90,14 @@ def compute_command_prefix(
         return prefix
 
 
+def _warm_import(name: str) -> Optional[Exception]:
+    try:
+        importlib.import_module(name)
+    except Exception as error:
+        return error
+    return None
+
+
 class BotBase(BB):
     """The base bot class for Lifesaver bots.
 
@@ -67,6 +116,14 @@ class BotBase(BB):
         #: The bot's :class:`BotConfig`.
         self.config = cfg
 
+        # Prefixes can only be precompiled when they're known ahead of time, so
+        # bail if the prefix is customized in any way.
+        static_prefix = (
+            "command_prefix" not in kwargs
+            and isinstance(cfg.command_prefix, (str, list))
+            and type(self).get_prefix is BotBase.get_prefix
+        )
+
         command_prefix = kwargs.pop("command_prefix", compute_command_prefix(cfg))
         description = kwargs.pop("description", self.config.description)
         help_command = kwargs.pop(
@@ -76,11 +133,29 @@ class BotBase(BB):
         intents_specifier = cfg.intents
         intents = discord.Intents.default()
         if isinstance(intents_specifier, list):
-            kwargs = {key: True for key in intents_specifier}
-            intents = discord.Intents(**kwargs)
+            intent_flags = {key: True for key in intents_specifier}
+            intents = discord.Intents(**intent_flags)
+        elif intents_specifier == "auto":
+            # The default intents are used until the real ones are derived when
+            # logging in, once the extensions have been loaded.
+            pass
         elif hasattr(discord.Intents, intents_specifier):
             intents = getattr(discord.Intents, intents_specifier)()
 
+        cache = cfg.cache
+        kwargs.setdefault("max_messages", cache.max_messages or None)
+        if intents_specifier != "auto":
+            # These are validated against the intents, so they're applied along
+            # with the derived intents instead when those are used.
+            if cache.member_cache is not None:
+                kwargs.setdefault(
+                    "member_cache_flags", self._member_cache_flags(cache.member_cache)
+                )
+            if cache.chunk_guilds_at_startup is not None:
+                kwargs.setdefault(
+                    "chunk_guilds_at_startup", cache.chunk_guilds_at_startup
+                )
+
         super().__init__(
             command_prefix=command_prefix,
             description=description,
@@ -99,19 +174,126 @@ class BotBase(BB):
         #: The bot's logger.
         self.log = logging.getLogger(__name__)
 
-        #: The Postgres pool connection.
-        self.pool: Optional["asyncpg.pool.Pool"] = None
+        self._emoji_table = self._compile_emoji_table()
+        self._emoji_cache: Dict[str, Union[str, discord.Emoji]] = {}
+        self._emoji_str_cache: Dict[str, str] = {}
+
+        #: The Postgres pool, wrapped to record metrics about it, or ``None`` if
+        #: :attr:`BotConfig.postgres` isn't set. The pool connects in the
+        #: background (see :meth:`connect_postgres`), and querying it before
+        #: then waits for it to connect.
+        self.pool: Optional[InstrumentedPool] = None
+        if self.config.postgres:
+            self.pool = InstrumentedPool()
+        self._pool_task: Optional[asyncio.Task] = None
 
         #: A list of extensions names to reload when calling :meth:`load_all`.
         self.load_list = LoadList()
 
+        #: The extensions whose loading has been deferred until they are needed.
+        #: See :attr:`BotConfig.lazy_extensions`.
+        self.lazy_extensions = LazyExtensions(self)
+
+        #: The time (in seconds) that it took to load each extension during the
+        #: last call to :meth:`load_all`.
+        self.extension_load_times: Dict[str, float] = {}
+
+        #: The :class:`lifesaver.profiling.StartupProfiler` recording the
+        #: startup of this bot, if any. It is finished once the bot is ready.
+        self.profiler: Optional[StartupProfiler] = None
+
+        #: The latency, errors, and in-flight invocations of every command.
+        #: ``None`` if :attr:`BotConfig.command_metrics` is disabled.
+        self.command_metrics: Optional[CommandMetrics] = (
+            CommandMetrics() if cfg.command_metrics else None
+        )
+
+        #: The concurrency limits applied to command invocations. ``None`` if
+        #: :attr:`BotConfig.concurrency` is disabled.
+        self.concurrency: Optional[ConcurrencyLimiter] = None
+        if cfg.concurrency.enabled:
+            concurrency = cfg.concurrency
+            self.concurrency = ConcurrencyLimiter(
+                global_limit=concurrency.global_limit,
+                per_guild=concurrency.per_guild,
+                per_command=concurrency.per_command,
+                command_limits=dict(concurrency.commands),
+                max_queue=concurrency.max_queue,
+                queue_timeout=concurrency.queue_timeout,
+                policy=concurrency.policy,
+            )
+
+        #: The intents derived from the loaded extensions when logging in, and
+        #: why each was enabled. Only set when :attr:`BotConfig.intents` is
+        #: ``auto``.
+        self.intents_report: Optional[IntentsReport] = None
+
+        #: The :class:`lifesaver.cluster.ClusterClient` connecting this bot to
+        #: the other clusters, if it is running as a cluster. See the
+        #: ``--clusters`` option of the CLI.
+        self.cluster: Optional["ClusterClient"] = None
+
+        self._connector: Optional[aiohttp.TCPConnector] = None
+
+        #: The scheduler that runs the methods of cogs decorated with
+        #: :meth:`lifesaver.commands.Cog.every`.
+        self.scheduler = Scheduler(
+            loop=self.loop, wait_until_ready=self.wait_until_ready
+        )
+
+        #: The pool of worker processes that CPU-bound work is run in, configured
+        #: by :attr:`BotConfig.processes`. The workers are started when first
+        #: needed. See :meth:`run_cpu`.
+        self.processes = ProcessPool(
+            loop=self.loop,
+            workers=cfg.processes.workers,
+            preload=cfg.processes.preload,
+            start_method=cfg.processes.start_method,
+        )
+
         #: A list of included extensions built into lifesaver to load.
         self._included_extensions: List[str] = INCLUDED_EXTENSIONS
 
+        self._static_prefix = command_prefix if static_prefix else None
+        self._prefix_matcher: Optional[PrefixMatcher] = None
+
+        #: The per-guild prefixes, if enabled. See :attr:`BotConfig.guild_prefixes`.
+        self.guild_prefixes: Optional[GuildPrefixes] = None
+        if cfg.guild_prefixes.enabled and static_prefix:
+            self.guild_prefixes = self._create_guild_prefixes()
+
         self._hot_task = None
         self._hot_reload_poller = None
         self._hot_plug = None
 
+        self._shutting_down = False
+        self._invocations: Set[asyncio.Task] = set()
+
+    def _compile_emoji_table(self) -> Dict[str, Union[str, int]]:
+        table = flatten_dict(self.config.emojis)
+
+        for accessor, value in table.items():
+            if isinstance(value, bool) or not isinstance(value, (str, int)):
+                raise ConfigError(
+                    f"Invalid emoji {accessor!r} in the emoji table: expected a "
+                    f"string or custom emoji ID, got {value!r}."
+                )
+
+        return table
+
+    def _refresh_emojis(self) -> None:
+        """Clear resolved emojis, then resolve every custom emoji again."""
+        self._emoji_cache.clear()
+        self._emoji_str_cache.clear()
+
+        for accessor, value in self._emoji_table.items():
+            if isinstance(value, int) and self.emoji(accessor) is None:
+                self.log.warning(
+                    "Custom emoji %s (%d) from the emoji table can't be found.",
+                    accessor,
+                    value,
+                )
+
     def emoji(
         self, accessor: str, *, stringify: bool = False
     ) -> Union[str, discord.Emoji]:
@@ -123,18 +305,31 @@ class BotBase(BB):
         Both Unicode codepoints and custom emoji IDs are supported. If a custom
         emoji ID is used, :meth:`discord.Client.get_emoji` is called to
         retrieve the :class:`discord.Emoji`.
+
+        The emoji table is flattened and validated when the bot is created, and
+        resolved emojis (and their string forms) are cached. Custom emojis are
+        resolved again when the bot becomes ready and when a guild's emojis are
+        updated.
         """
-        emoji_id = dot_access(self.config.emojis, accessor)
+        cache = self._emoji_str_cache if stringify else self._emoji_cache
+        try:
+            return cache[accessor]
+        except KeyError:
+            pass
 
-        if isinstance(emoji_id, int):
-            emoji = self.get_emoji(emoji_id)
-        else:
-            emoji = emoji_id
+        value = self._emoji_table[accessor]
 
-        if stringify:
-            return str(emoji)
+        if isinstance(value, int):
+            emoji = self.get_emoji(value)
+            if emoji is None:
+                # Not resolvable (yet), so don't cache it.
+                return "None" if stringify else emoji
         else:
-            return emoji
+            emoji = value
+
+        self._emoji_cache[accessor] = emoji
+        self._emoji_str_cache[accessor] = str(emoji)
+        return cache[accessor]
 
     def tick(self, variant: bool = True) -> Union[str, discord.Emoji]:
         """Return a tick emoji.
@@ -163,25 +358,165 @@ class BotBase(BB):
             self._hot_plug.handle(event)
             self._rebuild_load_list()
 
+    def _profile(self, name: str, **args):
+        if self.profiler is None or self.profiler.finished:
+            return contextlib.nullcontext({})
+        return self.profiler.span(name, **args)
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        """The connection pool shared by every session created with
+        :meth:`create_session`, configured by :attr:`BotConfig.http`. It's
+        created when first accessed.
+        """
+        if self._connector is None or self._connector.closed:
+            http = self.config.http
+            self._connector = aiohttp.TCPConnector(
+                limit=http.limit,
+                limit_per_host=http.limit_per_host,
+                keepalive_timeout=http.keepalive_timeout,
+                use_dns_cache=http.dns_cache_ttl != 0,
+                ttl_dns_cache=http.dns_cache_ttl,
+                loop=self.loop,
+            )
+        return self._connector
+
+    def create_session(self, **kwargs) -> aiohttp.ClientSession:
+        """Create an :class:`aiohttp.ClientSession` that uses the shared
+        :attr:`connector`.
+
+        The session is cheap to create, and closing it leaves the connector
+        open. Keyword arguments are passed to :class:`aiohttp.ClientSession`.
+        """
+        return aiohttp.ClientSession(
+            connector=self.connector, connector_owner=False, loop=self.loop, **kwargs
+        )
+
+    async def run_cpu(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a CPU-bound function (e.g. image generation) in :attr:`processes`
+        without blocking the event loop, and return its result.
+
+        The function and its arguments are pickled, so the function must be
+        importable from its module. See
+        :meth:`lifesaver.bot.processes.ProcessPool.run`.
+        """
+        return await self.processes.run(func, *args, **kwargs)
+
+    def connect_postgres(self) -> Optional[asyncio.Task]:
+        """Start connecting :attr:`pool` in the background, if it isn't already.
+
+        This is called by :meth:`login`, so that the pool connects while the
+        bot connects to the gateway. Use :meth:`pool_ready` to wait for it.
+
+        Returns the task that connects the pool, or ``None`` if
+        :attr:`BotConfig.postgres` isn't set.
+        """
+        if self.pool is None:
+            return None
+
+        if self._pool_task is None:
+            try:
+                import asyncpg  # noqa: F401
+            except ImportError:
+                raise RuntimeError(
+                    "Cannot connect to Postgres, asyncpg is not installed"
+                )
+
+            self._pool_task = self.loop.create_task(self._postgres_connect())
+
+        return self._pool_task
+
     async def _postgres_connect(self):
+        self.log.debug("creating a postgres pool")
         try:
-            import asyncpg
-        except ImportError:
-            raise RuntimeError("Cannot connect to Postgres, asyncpg is not installed")
+            with self._profile("postgres connect"):
+                await self.pool.connect(self.config.postgres)
+        except Exception:
+            # Anything waiting for the pool receives the error too.
+            self.log.exception("Failed to connect to Postgres.")
+        else:
+            self.log.debug("created postgres pool")
 
-        self.log.debug("creating a postgres pool")
-        self.pool = await asyncpg.create_pool(dsn=self.config.postgres["dsn"])
-        self.log.debug("created postgres pool")
+    async def pool_ready(self) -> InstrumentedPool:
+        """Wait for :attr:`pool` to connect, then return it.
+
+        Raises the error that connecting failed with, if it did.
+        """
+        if self.pool is None:
+            raise RuntimeError("Postgres isn't configured.")
+
+        self.connect_postgres()
+        await self.pool.wait_until_ready()
+        return self.pool
 
     def _rebuild_load_list(self):
-        self.load_list.build(Path(self.config.extensions_path))
+        exts_path = Path(self.config.extensions_path)
+        manifest = manifest_path(exts_path) if self.config.extensions_manifest else None
+
+        self.load_list.build(
+            exts_path, discovery=self.config.extension_discovery, manifest=manifest,
+        )
+
+    def _should_defer(self, extension_name: str) -> bool:
+        lazy = self.config.lazy_extensions
+        if isinstance(lazy, list):
+            return extension_name in lazy
+        return bool(lazy) and extension_name in self.load_list
+
+    def _warmup_extensions(self, extension_names: List[str]) -> None:
+        workers = self.config.extension_warmup_workers
+
+        with Timer() as timer:
+            # Compile bytecode ahead of time so importing doesn't have to.
+            if Path(self.config.extensions_path).is_dir():
+                compileall.compile_dir(
+                    self.config.extensions_path, quiet=1, workers=workers or 0
+                )
+
+            modules: Set[str] = set()
+            for extension_name in extension_names:
+                try:
+                    spec = importlib.util.find_spec(extension_name)
+                except (ImportError, ValueError):
+                    continue
+                if spec is None or not (spec.origin or "").endswith(".py"):
+                    continue
+
+                try:
+                    modules |= scan_imports(Path(spec.origin))
+                except (SyntaxError, ValueError, OSError):
+                    continue
+
+            pending = sorted(modules - set(sys.modules))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for (name, error) in zip(pending, executor.map(_warm_import, pending)):
+                    if error is not None:
+                        self.log.debug("Failed to warm up %s: %r", name, error)
+
+        self.log.info(
+            "Warmed up %d module(s) for %d extension(s) in %s.",
+            len(pending),
+            len(extension_names),
+            timer,
+        )
 
     def load_all(self, *, reload: bool = False, exclude_default: bool = False):
         """Load all extensions in the load list.
 
-        The load list is always rebuilt first when called.
+        The load list is always rebuilt first when called. If
+        :attr:`BotConfig.extensions_manifest` is enabled, the rebuild is skipped
+        when the persisted manifest is still up to date.
         When done, the ``load_all`` event is dispatched with the value of ``reload``.
 
+        Extensions that are configured to be lazy (see
+        :attr:`BotConfig.lazy_extensions`) aren't loaded, but deferred through
+        :attr:`lazy_extensions` instead. Deferred extensions that haven't been
+        loaded yet are skipped when reloading.
+
+        Extensions that fail to load are logged and removed from the load list
+        instead of aborting startup. Extensions that fail to reload keep running
+        their previous version.
+
         Parameters
         ----------
         reload
@@ -197,20 +532,451 @@ class BotBase(BB):
         else:
             load_list = self.load_list + self._included_extensions
 
-        for extension_name in load_list:
-            if reload:
-                self.reload_extension(extension_name)
-            else:
-                self.load_extension(extension_name)
+        if self.config.extension_warmup and not reload:
+            with self._profile("extension warmup"):
+                self._warmup_extensions(
+                    [name for name in load_list if not self._should_defer(name)]
+                )
+
+        self.extension_load_times = {}
+
+        for extension_name in list(load_list):
+            if reload and extension_name in self.lazy_extensions:
+                continue
+
+            if (
+                not reload
+                and self._should_defer(extension_name)
+                and self.lazy_extensions.register(extension_name)
+            ):
+                continue
+
+            with self._profile(f"extension {extension_name}") as args, Timer() as timer:
+                try:
+                    if reload:
+                        self.reload_extension(extension_name)
+                    else:
+                        self.load_extension(extension_name)
+                except commands.ExtensionError:
+                    # Like a failed import during discovery, this shouldn't
+                    # stop the other extensions from loading.
+                    self.log.exception(
+                        "Failed to %s %s, skipping it:",
+                        "reload" if reload else "load",
+                        extension_name,
+                    )
+                    if not reload and extension_name in self.load_list:
+                        self.load_list.remove(extension_name)
+                    continue
+
+                imported = self.profiler and self.profiler.imports().get(extension_name)
+                if imported:
+                    # Split the time into executing the module and calling setup().
+                    import_time = imported["dur"] / 1_000_000
+                    elapsed = time.monotonic() - timer.begin
+                    args["import"] = import_time
+                    args["setup"] = max(elapsed - import_time, 0.0)
+
+            self.extension_load_times[extension_name] = timer.duration
+            self.log.debug("Loaded %s in %s.", extension_name, timer)
+
+        if self.extension_load_times:
+            self.log.info(
+                "Loaded %d extension(s) in %s.",
+                len(self.extension_load_times),
+                format_seconds(sum(self.extension_load_times.values())),
+            )
 
         self.dispatch("load_all", reload)
 
+    @staticmethod
+    def _member_cache_flags(enabled: Iterable[str]) -> discord.MemberCacheFlags:
+        flags = discord.MemberCacheFlags.none()
+        for flag in enabled:
+            if flag not in discord.MemberCacheFlags.VALID_FLAGS:
+                raise ConfigError(f"Invalid member cache flag: {flag!r}")
+            setattr(flags, flag, True)
+        return flags
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Return the number of cached objects of each type."""
+        state = self._connection
+        guilds = state._guilds.values()
+
+        return {
+            "guilds": len(state._guilds),
+            "channels": sum(len(guild._channels) for guild in guilds),
+            "roles": sum(len(guild._roles) for guild in guilds),
+            "members": sum(len(guild._members) for guild in guilds),
+            "users": len(state._users),
+            "emojis": len(state._emojis),
+            "private_channels": len(state._private_channels),
+            "messages": len(state._messages) if state._messages is not None else 0,
+        }
+
+    def _apply_auto_intents(self) -> None:
+        cache = self.config.cache
+        report = derive_intents(
+            self,
+            privileged=self.config.intents_privileged,
+            include=self.config.intents_include,
+            member_cache=cache.member_cache or (),
+            chunk_guilds=bool(cache.chunk_guilds_at_startup),
+        )
+        self.intents_report = report
+        self.log.info("%s", report)
+
+        for intent, reasons in report.skipped.items():
+            self.log.warning(
+                "The %s intent is privileged and not allowed by intents_privileged, "
+                "so these won't work: %s",
+                intent,
+                ", ".join(reasons),
+            )
+
+        # The connection state reads these when identifying and when caching
+        # members, so they can still be changed before connecting.
+        intents = report.intents
+        if cache.member_cache is None:
+            flags = discord.MemberCacheFlags.from_intents(intents)
+        else:
+            # Drop the flags whose (privileged) intents weren't allowed.
+            flags = self._member_cache_flags(
+                flag
+                for flag in cache.member_cache
+                if getattr(intents, MEMBER_CACHE_INTENTS[flag])
+            )
+
+        state = self._connection
+        state._intents = intents
+        state.member_cache_flags = flags
+        chunk_guilds = cache.chunk_guilds_at_startup is not False
+        state._chunk_guilds = intents.members and chunk_guilds
+        if intents.members and not flags._empty:
+            state.__dict__.pop("store_user", None)
+        else:
+            state.store_user = state.store_user_no_intents
+
+    def _install_signal_handlers(self) -> None:
+        # discord.py's run() stops the loop on these signals, which cancels
+        # everything at once. Shut down gracefully instead.
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(
+                    signum, lambda: asyncio.ensure_future(self.close())
+                )
+            except (NotImplementedError, RuntimeError):
+                # Not supported on this platform, or not on the main thread.
+                pass
+
+    @property
+    def is_shutting_down(self) -> bool:
+        """Whether :meth:`close` has been called. No commands are invoked once
+        the bot is shutting down.
+        """
+        return self._shutting_down
+
+    async def _drain_invocations(self, timeout: float) -> None:
+        current = asyncio.current_task()
+        invocations = [task for task in self._invocations if task is not current]
+        if not invocations:
+            return
+
+        self.log.info("Waiting for %d running command(s).", len(invocations))
+        _, pending = await asyncio.wait(invocations, timeout=timeout)
+
+        if pending:
+            self.log.warning(
+                "Cancelling %d command(s) that didn't finish in time.", len(pending)
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending)
+
+    async def close(self):
+        """Gracefully shut down the bot.
+
+        1. Stop invoking commands.
+        2. Wait for running commands, scheduled tasks
+           (see :meth:`lifesaver.commands.Cog.every`), and work running in
+           :attr:`processes` to finish, for up to
+           :attr:`BotConfig.shutdown_timeout` seconds in total, then cancel them.
+        3. Close the sessions of cogs and the shared :attr:`connector`.
+        4. Flush every :class:`lifesaver.bot.storage.AsyncJSONStorage`.
+        5. Close the Postgres pool.
+        6. Unload extensions and disconnect.
+
+        The time taken by each step is logged before disconnecting, because
+        :meth:`run` stops the event loop (cancelling whatever is left of this
+        coroutine) as soon as the bot disconnects. ``SIGINT`` and ``SIGTERM`` also
+        shut down the bot this way when it's started with :meth:`run`.
+        """
+        if self._shutting_down:
+            return
+        self._shutting_down = True
+
+        self.log.info("Shutting down.")
+        timings: Dict[str, float] = {}
+        deadline = time.monotonic() + self.config.shutdown_timeout
+
+        def remaining() -> float:
+            return max(deadline - time.monotonic(), 0)
+
+        with Timer() as total:
+            with Timer() as timer:
+                await self._drain_invocations(remaining())
+            timings["commands"] = timer.duration
+
+            with Timer() as timer:
+                await self.scheduler.close(timeout=remaining())
+            timings["schedules"] = timer.duration
+
+            with Timer() as timer:
+                await self.processes.shutdown(timeout=remaining())
+            timings["processes"] = timer.duration
+
+            with Timer() as timer:
+                cogs = [
+                    cog
+                    for cog in self.cogs.values()
+                    if isinstance(cog, lifesaver.commands.Cog)
+                ]
+                await asyncio.gather(
+                    *(cog.session.close() for cog in cogs if not cog.session.closed)
+                )
+                if self._connector is not None:
+                    await self._connector.close()
+            timings["sessions"] = timer.duration
+
+            with Timer() as timer:
+                await AsyncJSONStorage.flush_all()
+            timings["storages"] = timer.duration
+
+            with Timer() as timer:
+                if self._pool_task is not None and not self._pool_task.done():
+                    self._pool_task.cancel()
+                if self.pool is not None and self.pool.ready:
+                    try:
+                        await asyncio.wait_for(self.pool.close(), timeout=10)
+                    except asyncio.TimeoutError:
+                        self.log.warning("The pool didn't close in time, terminating.")
+                        self.pool.terminate()
+            timings["pool"] = timer.duration
+
+        self.log.info(
+            "Shut down in %s (%s).",
+            format_seconds(total.duration),
+            ", ".join(
+                f"{step}: {format_seconds(duration)}"
+                for (step, duration) in timings.items()
+            ),
+        )
+
+        # Everything that has to finish is done by now, see above.
+        await super().close()
+
+    async def login(self, *args, **kwargs):
+        self._install_signal_handlers()
+
+        if self.config.intents == "auto":
+            self._apply_auto_intents()
+
+        self.connect_postgres()
+
+        if self.config.processes.warm:
+            self.loop.create_task(self.processes.warm())
+
+        with self._profile("login"):
+            await super().login(*args, **kwargs)
+
+        if self.profiler is not None:
+            self.profiler.begin("gateway")
+
     async def on_ready(self):
         self.log.info("Ready! Logged in as %s (%d)", self.user, self.user.id)
 
+        self._refresh_emojis()
+
+        if self.profiler is not None and not self.profiler.finished:
+            self.profiler.end("gateway")
+            self.profiler.mark("ready")
+            self.log.info("%s", self.profiler.finish())
+
         if self.config.hot_reload and self._hot_plug is None:
             await self._setup_hot_reload()
 
+    def _create_guild_prefixes(self) -> GuildPrefixes:
+        cfg = self.config.guild_prefixes
+
+        if cfg.backend == "postgres":
+            backend = PostgresGuildPrefixBackend(self, table=cfg.table)
+        elif cfg.backend == "storage":
+            storage = AsyncJSONStorage(cfg.file, loop=self.loop)
+            backend = StorageGuildPrefixBackend(storage)
+        else:
+            raise ValueError(f"Unknown guild prefix backend: {cfg.backend!r}")
+
+        return GuildPrefixes(
+            backend, compile=self._compile_prefix_matcher, max_size=cfg.cache_size
+        )
+
+    def _compile_prefix_matcher(
+        self, prefixes: Optional[List[str]] = None
+    ) -> PrefixMatcher:
+        if prefixes is None:
+            prefix = self.config.command_prefix
+            prefixes = [prefix] if isinstance(prefix, str) else list(prefix)
+        else:
+            prefixes = list(prefixes)
+
+        if self.config.command_prefix_include_mentions and self.user is not None:
+            # These are the same as the ones used by commands.when_mentioned.
+            prefixes += [f"<@{self.user.id}> ", f"<@!{self.user.id}> "]
+
+        return PrefixMatcher(
+            prefixes, case_insensitive=self.config.command_prefix_case_insensitive
+        )
+
+    def _static_prefix_matcher(self) -> Optional[PrefixMatcher]:
+        """Return the compiled :class:`PrefixMatcher` for the configured prefixes.
+
+        ``None`` is returned if the prefixes aren't known ahead of time (a
+        custom ``command_prefix`` was passed, or :attr:`command_prefix` was
+        changed), or if the bot hasn't logged in yet.
+        """
+        static_prefix = self._static_prefix
+        if static_prefix is None or self.command_prefix is not static_prefix:
+            return None
+
+        if self._prefix_matcher is None:
+            if self.user is None:
+                return None
+            self._prefix_matcher = self._compile_prefix_matcher()
+
+        return self._prefix_matcher
+
+    async def _message_prefix_matcher(
+        self, message: discord.Message
+    ) -> Optional[PrefixMatcher]:
+        matcher = self._static_prefix_matcher()
+        if matcher is None or self.guild_prefixes is None or message.guild is None:
+            return matcher
+
+        # Only await (and fetch from the backend) if the guild isn't cached.
+        guild_matcher = self.guild_prefixes.peek(message.guild.id)
+        if guild_matcher is MISSING:
+            guild_matcher = await self.guild_prefixes.matcher(message.guild.id)
+
+        return guild_matcher or matcher
+
+    async def get_prefix(self, message: discord.Message) -> Union[List[str], str]:
+        """Return the prefix that a message was invoked with.
+
+        When the prefixes are static, the longest prefix that the message starts
+        with is found through a precompiled :class:`PrefixMatcher` instead of
+        checking every prefix, and prefixes are matched case insensitively if
+        :attr:`BotConfig.command_prefix_case_insensitive` is enabled. Per-guild
+        prefixes are taken into account if enabled.
+        """
+        matcher = await self._message_prefix_matcher(message)
+        if matcher is None:
+            return await super().get_prefix(message)
+
+        prefix = matcher.match(message.content)
+        if prefix is None:
+            # None of these match, so the message is correctly ignored.
+            return matcher.prefixes
+
+        return prefix
+
+    def collect_metrics(self) -> Dict[str, Any]:
+        """Return a JSON serializable snapshot of the bot's metrics."""
+        metrics: Dict[str, Any] = {"timestamp": time.time()}
+
+        if self.command_metrics is not None:
+            metrics["commands"] = self.command_metrics.to_dict()
+
+        if self.concurrency is not None:
+            metrics["concurrency"] = self.concurrency.to_dict()
+
+        if self.pool is not None:
+            metrics["pool"] = self.pool.to_dict()
+
+        http_caches = list(CachedSession._instances)
+        if http_caches:
+            metrics["http_caches"] = {
+                cache.name: cache.to_dict() for cache in http_caches
+            }
+
+        metrics["schedule"] = self.scheduler.to_dict()
+        metrics["processes"] = self.processes.to_dict()
+        metrics["cache"] = self.cache_stats()
+        metrics["memory"] = memory_usage()
+
+        return metrics
+
+    async def invoke(self, ctx: commands.Context):
+        """Invoke the command of a context.
+
+        The invocation is subject to the concurrency limits configured in
+        :attr:`BotConfig.concurrency`, and its metrics are recorded if
+        :attr:`BotConfig.command_metrics` is enabled.
+        """
+        if self._shutting_down:
+            return
+
+        task = asyncio.current_task()
+        self._invocations.add(task)
+        try:
+            await self._invoke_limited(ctx)
+        finally:
+            self._invocations.discard(task)
+
+    async def _invoke_limited(self, ctx: commands.Context):
+        if ctx.command is not None and self.lazy_extensions.is_placeholder(
+            ctx.command
+        ):
+            # The real command is invoked (and limited, and measured) once its
+            # extension has been loaded.
+            await super().invoke(ctx)
+            return
+
+        if self.concurrency is None or ctx.command is None:
+            await self._invoke_measured(ctx)
+            return
+
+        try:
+            held = await self.concurrency.acquire(ctx)
+        except ConcurrencyLimitExceeded as error:
+            await ctx.command.dispatch_error(ctx, error)
+            return
+
+        try:
+            await self._invoke_measured(ctx)
+        finally:
+            self.concurrency.release(held)
+
+    async def _invoke_measured(self, ctx: commands.Context):
+        metrics = self.command_metrics
+        if metrics is None or ctx.command is None:
+            await super().invoke(ctx)
+            return
+
+        # The in-flight gauge belongs to the command that was invoked, but the
+        # latency is recorded for the subcommand that actually ran, if any.
+        stats = metrics.get(ctx.command.qualified_name)
+        stats.in_flight += 1
+        start = time.perf_counter()
+
+        try:
+            await super().invoke(ctx)
+        finally:
+            stats.in_flight -= 1
+            metrics.record(ctx, time.perf_counter() - start)
+
+    async def on_guild_emojis_update(self, guild, before, after):
+        self._refresh_emojis()
+
     async def on_message(self, message: discord.Message):
         """The handler that handles incoming messages from Discord.
 
@@ -218,13 +984,26 @@ class BotBase(BB):
         commands. Bots are ignored according to :attr:`BotConfig.ignore_bots`
         and the context class used for commands is determined by
         :attr:`context_cls`.
+
+        Messages that can't possibly invoke a command are discarded early,
+        without creating a context. See :attr:`BotConfig.command_prefilter`.
         """
-        await self.wait_until_ready()
+        if not self.is_ready():
+            await self.wait_until_ready()
+
+        if self._shutting_down:
+            return
 
         # Ignore bots if applicable.
         if self.config.ignore_bots and message.author.bot:
             return
 
+        if self.config.command_prefilter:
+            # Discard messages that can't be commands without creating a context.
+            matcher = await self._message_prefix_matcher(message)
+            if matcher is not None and matcher.match(message.content) is None:
+                return
+
         # Grab a context, then invoke it.
         ctx = await self.get_context(message, cls=self.context_cls)
         await self.invoke(ctx)
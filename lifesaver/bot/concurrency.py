@@ -0,0 +1,315 @@
+# encoding: utf-8
+
+"""Command concurrency limiting."""
+
+__all__ = [
+    "ConcurrencyLimitExceeded",
+    "ConcurrencyLimit",
+    "ConcurrencyLimiter",
+    "POLICIES",
+]
+
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Hashable, Iterator, List, Optional
+
+from discord.ext import commands
+
+from lifesaver.utils.timing import Histogram
+
+#: The ways that a full queue can be handled. ``reject`` turns away the new
+#: invocation, and ``shed`` turns away the invocation that has waited the
+#: longest in favor of the new one.
+POLICIES = ("reject", "shed")
+
+
+def _invoked_command(ctx) -> commands.Command:
+    """Return the (sub)command that an invocation will run.
+
+    Only the top-level command has been resolved when a command is invoked, so
+    the subcommands are resolved from the rest of the message like
+    :meth:`discord.ext.commands.Group.invoke` does, without consuming it. A
+    subcommand of a group that takes arguments can't be told apart from those
+    arguments before they are parsed, so the group is returned instead.
+    """
+    command = ctx.command
+    view = ctx.view
+    index, previous = view.index, view.previous
+
+    try:
+        while isinstance(command, commands.GroupMixin) and not command.clean_params:
+            view.skip_ws()
+            subcommand = command.all_commands.get(view.get_word())
+            if subcommand is None:
+                break
+            command = subcommand
+    finally:
+        view.index, view.previous = index, previous
+
+    return command
+
+
+class ConcurrencyLimitExceeded(commands.CommandError):
+    """A :class:`discord.ext.commands.CommandError` that is raised when a command
+    invocation is turned away because too many are running already.
+    """
+
+    def __init__(self, scope: str, reason: str) -> None:
+        super().__init__(f"Concurrency limit exceeded ({scope}): {reason}.")
+
+        #: The limit that was exceeded: ``global``, ``guild``, or ``command``.
+        self.scope = scope
+
+        #: Why the invocation was turned away: ``queue full``, ``shed``, or
+        #: ``timed out``.
+        self.reason = reason
+
+
+class ConcurrencyLimit:
+    """Caps the number of concurrent holders, with a bounded wait queue.
+
+    Waiters are admitted in the order that they arrived. A released slot is
+    handed directly to the next waiter, so a newcomer can't take it first.
+    """
+
+    __slots__ = (
+        "scope",
+        "key",
+        "capacity",
+        "max_queue",
+        "policy",
+        "active",
+        "_waiters",
+    )
+
+    def __init__(
+        self,
+        scope: str,
+        capacity: int,
+        *,
+        key: Hashable = None,
+        max_queue: int,
+        policy: str,
+    ) -> None:
+        self.scope = scope
+        self.key = key
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.policy = policy
+
+        #: The number of slots currently held.
+        self.active = 0
+
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def __repr__(self) -> str:
+        return (
+            f"<ConcurrencyLimit scope={self.scope!r} active={self.active}/"
+            f"{self.capacity} queued={self.queued}>"
+        )
+
+    @property
+    def queued(self) -> int:
+        """Return the number of waiters in the queue."""
+        return len(self._waiters)
+
+    @property
+    def idle(self) -> bool:
+        return not self.active and not self._waiters
+
+    async def acquire(self, timeout: Optional[float]) -> None:
+        """Acquire a slot, waiting in the queue for up to ``timeout`` seconds.
+
+        Raises :class:`ConcurrencyLimitExceeded` if the invocation is turned
+        away.
+        """
+        if self.active < self.capacity and not self._waiters:
+            self.active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            if self.policy != "shed" or not self._waiters:
+                raise ConcurrencyLimitExceeded(self.scope, "queue full")
+
+            oldest = self._waiters.popleft()
+            oldest.set_exception(ConcurrencyLimitExceeded(self.scope, "shed"))
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise ConcurrencyLimitExceeded(self.scope, "timed out") from None
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+            # A slot was handed over just as the waiter gave up, so pass it on.
+            self.release()
+            return
+
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        """Release a slot, handing it to the next waiter if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.active -= 1
+
+
+class ConcurrencyLimiter:
+    """Applies global, per-guild, and per-command concurrency limits to command
+    invocations. See :class:`lifesaver.bot.config.BotConcurrencyConfig`.
+
+    Limits are acquired from the most specific to the least specific, so that a
+    global slot isn't held while waiting for a guild or command slot.
+    """
+
+    def __init__(
+        self,
+        *,
+        global_limit: Optional[int] = None,
+        per_guild: Optional[int] = None,
+        per_command: Optional[int] = None,
+        command_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = 100,
+        queue_timeout: Optional[float] = 10.0,
+        policy: str = "reject",
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown concurrency policy: {policy!r}")
+
+        self.per_guild = per_guild
+        self.per_command = per_command
+        self.command_limits = command_limits or {}
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.policy = policy
+
+        self._global: Optional[ConcurrencyLimit] = None
+        if global_limit is not None:
+            self._global = self._create("global", global_limit)
+        self._guilds: Dict[int, ConcurrencyLimit] = {}
+        self._commands: Dict[str, ConcurrencyLimit] = {}
+
+        #: The number of turned away invocations, keyed by scope and reason
+        #: (e.g. ``"guild: queue full"``).
+        self.rejections: Counter = Counter()
+
+        #: The time spent waiting for slots by admitted invocations.
+        self.wait_times = Histogram()
+
+        #: The largest number of invocations that have been waiting at once.
+        self.max_queue_depth = 0
+
+        #: The number of admitted invocations that are currently running.
+        self.active = 0
+
+        #: The number of invocations that are currently waiting for a slot.
+        self.queued = 0
+
+    def __repr__(self) -> str:
+        return f"<ConcurrencyLimiter policy={self.policy!r} queued={self.queued}>"
+
+    def _create(
+        self, scope: str, capacity: int, key: Hashable = None
+    ) -> ConcurrencyLimit:
+        return ConcurrencyLimit(
+            scope, capacity, key=key, max_queue=self.max_queue, policy=self.policy
+        )
+
+    def _limits(self, ctx) -> Iterator[ConcurrencyLimit]:
+        # This is a generator so that each limit is looked up right before it is
+        # acquired, after any idle limit with the same key has been forgotten.
+        command = _invoked_command(ctx).qualified_name
+        capacity = self.command_limits.get(command, self.per_command)
+        if capacity is not None:
+            limit = self._commands.get(command)
+            if limit is None:
+                limit = self._create("command", capacity, command)
+                self._commands[command] = limit
+            yield limit
+
+        if self.per_guild is not None and ctx.guild is not None:
+            limit = self._guilds.get(ctx.guild.id)
+            if limit is None:
+                limit = self._create("guild", self.per_guild, ctx.guild.id)
+                self._guilds[ctx.guild.id] = limit
+            yield limit
+
+        if self._global is not None:
+            yield self._global
+
+    async def acquire(self, ctx) -> List[ConcurrencyLimit]:
+        """Acquire every limit that applies to an invocation, returning them so
+        that they can be released with :meth:`release`.
+
+        Raises :class:`ConcurrencyLimitExceeded` if the invocation is turned
+        away.
+        """
+        acquired: List[ConcurrencyLimit] = []
+        start = time.perf_counter()
+
+        try:
+            for limit in self._limits(ctx):
+                waiting = limit.active >= limit.capacity or limit.queued > 0
+                if waiting:
+                    self.queued += 1
+                    self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+                try:
+                    await limit.acquire(self.queue_timeout)
+                finally:
+                    if waiting:
+                        self.queued -= 1
+
+                acquired.append(limit)
+        except ConcurrencyLimitExceeded as error:
+            self.rejections[f"{error.scope}: {error.reason}"] += 1
+            self._release(acquired)
+            raise
+        except BaseException:
+            self._release(acquired)
+            raise
+
+        self.wait_times.record(time.perf_counter() - start)
+        self.active += 1
+        return acquired
+
+    def release(self, limits: List[ConcurrencyLimit]) -> None:
+        """Release limits acquired with :meth:`acquire`."""
+        self.active -= 1
+        self._release(limits)
+
+    def _release(self, limits: List[ConcurrencyLimit]) -> None:
+        for limit in reversed(limits):
+            limit.release()
+
+        # Forget idle guild and command limits, so that they don't accumulate.
+        for limit in limits:
+            if limit.idle and limit.scope == "guild":
+                self._guilds.pop(limit.key, None)
+            elif limit.idle and limit.scope == "command":
+                self._commands.pop(limit.key, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serializable representation of the limiter's state."""
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "rejections": dict(self.rejections),
+            "wait_times": self.wait_times.to_dict(),
+        }
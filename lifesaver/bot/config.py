@@ -1,6 +1,14 @@
 # encoding: utf-8
 
-__all__ = ["BotConfig", "BotLoggingConfig"]
+__all__ = [
+    "BotConfig",
+    "BotLoggingConfig",
+    "BotGuildPrefixesConfig",
+    "BotConcurrencyConfig",
+    "BotCacheConfig",
+    "BotHttpConfig",
+    "BotProcessesConfig",
+]
 
 from typing import Any, Dict, List, Optional, Union
 
@@ -29,6 +37,108 @@ class BotLoggingConfig(Config):
     time_format: str = "%Y-%m-%d %H:%M:%S"
 
 
+class BotGuildPrefixesConfig(Config):
+    #: Enables per-guild prefixes. Only applies when the prefixes are static,
+    #: i.e. they come from :attr:`BotConfig.command_prefix` rather than a custom
+    #: ``command_prefix`` kwarg or an overridden
+    #: :meth:`lifesaver.bot.BotBase.get_prefix`.
+    enabled: bool = False
+
+    #: Where to persist prefixes. ``storage`` uses a JSON file at
+    #: :attr:`file`, and ``postgres`` uses :attr:`table` through the bot's pool.
+    backend: str = "storage"
+
+    #: The JSON file to persist prefixes to when using the ``storage`` backend.
+    file: str = "./prefixes.json"
+
+    #: The table to persist prefixes to when using the ``postgres`` backend.
+    table: str = "guild_prefixes"
+
+    #: The maximum number of guilds to keep cached in memory.
+    cache_size: int = 10000
+
+
+class BotConcurrencyConfig(Config):
+    #: Enables concurrency limiting for command invocations.
+    enabled: bool = False
+
+    #: The maximum number of commands that can run at once across the bot.
+    global_limit: Optional[int] = None
+
+    #: The maximum number of commands that can run at once in a single guild.
+    per_guild: Optional[int] = None
+
+    #: The maximum number of invocations of a single command that can run at
+    #: once. Can be overridden per command with :attr:`commands`.
+    per_command: Optional[int] = None
+
+    #: The maximum number of concurrent invocations of specific commands, keyed
+    #: by qualified name (e.g. ``{"tag create": 2}``). Subcommands of groups
+    #: that take arguments are limited as the group.
+    commands: Dict[str, int] = {}
+
+    #: The maximum number of invocations that can wait for each limit.
+    max_queue: int = 100
+
+    #: The number of seconds that an invocation can wait for each limit before
+    #: it is turned away. ``None`` waits indefinitely.
+    queue_timeout: Optional[float] = 10.0
+
+    #: What to do when a queue is full. ``reject`` turns away the new
+    #: invocation, and ``shed`` turns away the one that has waited the longest.
+    policy: str = "reject"
+
+
+class BotCacheConfig(Config):
+    #: The maximum number of messages to cache. ``None`` or ``0`` disables the
+    #: message cache, which also prevents edit and delete events from being
+    #: dispatched for uncached messages (raw events still are).
+    max_messages: Optional[int] = 1000
+
+    #: The members to cache, as a list of :class:`discord.MemberCacheFlags`
+    #: (``online``, ``voice``, and ``joined``). An empty list disables the member
+    #: cache. ``None`` caches every member that the intents allow.
+    member_cache: Optional[List[str]] = None
+
+    #: Requests the members of every guild when connecting. ``None`` does so if
+    #: the ``members`` intent is enabled.
+    chunk_guilds_at_startup: Optional[bool] = None
+
+
+class BotHttpConfig(Config):
+    #: The maximum number of open connections across every host. ``0`` means
+    #: unlimited.
+    limit: int = 100
+
+    #: The maximum number of open connections to a single host. ``0`` means
+    #: unlimited.
+    limit_per_host: int = 0
+
+    #: The number of seconds to keep idle connections open for reuse.
+    keepalive_timeout: float = 30.0
+
+    #: The number of seconds to cache DNS lookups for. ``None`` caches them
+    #: forever, and ``0`` disables the cache.
+    dns_cache_ttl: Optional[int] = 300
+
+
+class BotProcessesConfig(Config):
+    #: The number of worker processes. ``None`` uses the number of CPUs.
+    workers: Optional[int] = None
+
+    #: Starts every worker process when the bot logs in, instead of when work
+    #: is first submitted.
+    warm: bool = False
+
+    #: The names of modules that each worker process imports when it starts,
+    #: like ``PIL.Image``.
+    preload: List[str] = []
+
+    #: How worker processes are started: ``spawn``, ``fork``, or
+    #: ``forkserver``. See :func:`multiprocessing.get_context`.
+    start_method: str = "spawn"
+
+
 class BotConfig(Config):
     #: The token of the bot.
     token: str
@@ -49,6 +159,42 @@ class BotConfig(Config):
     #: The path to load extensions from.
     extensions_path: str = "./exts"
 
+    #: How extensions are discovered when building the load list.
+    #:
+    #: ``import`` imports every file in :attr:`extensions_path` to check for a
+    #: ``setup`` function. ``static`` parses each file's source for a top-level
+    #: ``setup`` instead, which is much faster as nothing is imported until the
+    #: extension is actually loaded.
+    extension_discovery: str = "import"
+
+    #: Persists the load list to a manifest file next to :attr:`extensions_path`.
+    #:
+    #: On startup, the manifest is validated by checking the modification
+    #: times of the extension files, and extension discovery is skipped
+    #: entirely if nothing has changed.
+    extensions_manifest: bool = False
+
+    #: Defers loading extensions until they're needed. Can be a boolean or a
+    #: list of extension names.
+    #:
+    #: Lazy extensions aren't imported on startup. Instead, their commands and
+    #: listeners are found by inspecting their source, and placeholders are
+    #: registered in their place. The real extension is loaded once one of its
+    #: commands is invoked or one of the events it listens to is dispatched.
+    #: Included extensions are never lazy.
+    lazy_extensions: Union[bool, List[str]] = False
+
+    #: Warms up extensions before :meth:`BotBase.load_all` loads them.
+    #:
+    #: The bytecode of :attr:`extensions_path` is compiled ahead of time, and
+    #: the modules that extensions import are imported concurrently on a
+    #: thread pool. Extensions are still loaded one after another in order.
+    extension_warmup: bool = False
+
+    #: The number of workers to use when warming up extensions. Defaults to
+    #: the number of processors.
+    extension_warmup_workers: Optional[int] = None
+
     #: The path for cog-specific configuration files.
     cog_config_path: str = "./config"
 
@@ -59,8 +205,34 @@ class BotConfig(Config):
     command_prefix: Union[List[str], str] = "!"
 
     #: The intent flag used when connecting to the gateway.
+    #:
+    #: Can be the name of a :class:`discord.Intents` classmethod (like
+    #: ``default``), a list of intents to enable, or ``auto``, which derives the
+    #: intents that the loaded extensions need when the bot logs in. See
+    #: :attr:`lifesaver.bot.BotBase.intents_report`.
     intents: Union[List[str], str] = "default"
 
+    #: Message and member cache configuration. See :class:`BotCacheConfig`.
+    cache: BotCacheConfig
+
+    #: Outbound HTTP configuration. Every :class:`aiohttp.ClientSession` created
+    #: with :meth:`lifesaver.bot.BotBase.create_session` (including the session
+    #: of each cog) shares a single connection pool, configured here. See
+    #: :class:`BotHttpConfig`.
+    http: BotHttpConfig
+
+    #: The pool of worker processes that CPU-bound work is run in. See
+    #: :class:`BotProcessesConfig` and :meth:`lifesaver.bot.BotBase.run_cpu`.
+    processes: BotProcessesConfig
+
+    #: The privileged intents (``members`` and ``presences``) that ``auto``
+    #: intents may enable. They must also be enabled in the developer portal.
+    intents_privileged: List[str] = []
+
+    #: Intents that ``auto`` intents always enable, e.g. for events that are only
+    #: waited for with :meth:`discord.Client.wait_for`.
+    intents_include: List[str] = []
+
     #: The bot's description. Shown in the help command.
     description: str = "A Discord bot."
 
@@ -71,11 +243,49 @@ class BotConfig(Config):
     #: Determines whether mentions work as a prefix.
     command_prefix_include_mentions: bool = True
 
+    #: Matches command prefixes case insensitively. Only applies when the
+    #: prefixes are static (i.e. the ``command_prefix`` kwarg and
+    #: :meth:`lifesaver.bot.BotBase.get_prefix` aren't overridden).
+    command_prefix_case_insensitive: bool = False
+
+    #: Per-guild prefix configuration. See :class:`BotGuildPrefixesConfig`.
+    #:
+    #: A guild's custom prefixes replace :attr:`command_prefix` in that guild.
+    #: Mentions still work if :attr:`command_prefix_include_mentions` is enabled.
+    guild_prefixes: BotGuildPrefixesConfig
+
+    #: Discards messages that don't start with a prefix before creating a
+    #: context for them. Only applies when the prefixes are static.
+    command_prefilter: bool = True
+
+    #: Records the latency, errors, and in-flight invocations of every command.
+    #: See :attr:`lifesaver.bot.BotBase.command_metrics`.
+    command_metrics: bool = True
+
+    #: Concurrency limits for command invocations. See
+    #: :class:`BotConcurrencyConfig`.
+    #:
+    #: Invocations that exceed a limit wait in a bounded queue. Those that are
+    #: turned away fail with
+    #: :class:`lifesaver.bot.concurrency.ConcurrencyLimitExceeded`.
+    concurrency: BotConcurrencyConfig
+
+    #: The number of seconds that running commands and scheduled tasks are
+    #: given to finish when the bot shuts down. See
+    #: :meth:`lifesaver.bot.BotBase.close`.
+    shutdown_timeout: float = 30.0
+
     #: Enables the hot reloader.
     hot_reload: bool = False
 
     #: The global bot emoji table.
     emojis: Dict[str, Any] = DEFAULT_EMOJIS
 
-    #: PostgreSQL access credentials.
+    #: PostgreSQL access credentials and pool settings. Every key is passed to
+    #: :func:`asyncpg.create_pool` (e.g. ``dsn``, ``min_size``, ``max_size``,
+    #: ``statement_cache_size``, and ``command_timeout``), except for ``init``
+    #: and ``setup``, which are lists of ``module:function`` paths to coroutine
+    #: functions that are called with each new connection and with each
+    #: acquired connection respectively. See
+    #: :func:`lifesaver.bot.pool.create_pool`.
     postgres: Optional[Dict[str, Any]] = None
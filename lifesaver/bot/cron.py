@@ -0,0 +1,174 @@
+# encoding: utf-8
+
+"""Parsing cron expressions."""
+
+__all__ = ["ALIASES", "CronExpression"]
+
+import datetime
+from typing import FrozenSet, Optional
+
+#: Shorthands for common cron expressions.
+ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+MONTH_NAMES = "jan feb mar apr may jun jul aug sep oct nov dec".split()
+DAY_NAMES = "sun mon tue wed thu fri sat".split()
+
+# The number of days to search for the next match before giving up, which is
+# enough to find any date that exists (like February 29th).
+MAX_SEARCH_DAYS = 366 * 8
+
+
+def _value(text: str, low: int, names: Optional[list]) -> int:
+    if names is not None and text.lower() in names:
+        return names.index(text.lower()) + low
+    return int(text)
+
+
+def _parse_field(
+    field: str, low: int, high: int, names: Optional[list] = None
+) -> FrozenSet[int]:
+    values = set()
+
+    for part in field.split(","):
+        expression, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if step < 1:
+            raise ValueError(f"Invalid step in cron field {field!r}.")
+
+        if expression == "*":
+            start, end = low, high
+        elif "-" in expression:
+            start_text, _, end_text = expression.partition("-")
+            start = _value(start_text, low, names)
+            end = _value(end_text, low, names)
+        else:
+            start = _value(expression, low, names)
+            # "5/15" means every 15 starting from 5.
+            end = high if step_text else start
+
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field {field!r} is out of range ({low}-{high}).")
+
+        values.update(range(start, end + 1, step))
+
+    return frozenset(values)
+
+
+class CronExpression:
+    """A parsed cron expression, with five fields: minute, hour, day of month,
+    month, and day of week.
+
+    Fields support ``*``, lists (``1,15``), ranges (``1-5``), steps (``*/15``
+    and ``0-30/10``), and the names of months and days (``jan``, ``mon``). Day
+    of week ``7`` is Sunday, like ``0``. The aliases in :data:`ALIASES` (like
+    ``@hourly``) are supported too.
+
+    Like in cron, if both the day of month and the day of week are restricted,
+    a day matches if either matches.
+
+    Example
+    -------
+
+    .. code:: python3
+
+        >>> cron = CronExpression("*/15 9-17 * * mon-fri")
+        >>> cron.next_after(datetime.datetime(2020, 1, 3, 17, 50))
+        datetime.datetime(2020, 1, 6, 9, 0)
+    """
+
+    __slots__ = (
+        "expression",
+        "minutes",
+        "hours",
+        "days",
+        "months",
+        "weekdays",
+        "_any_day",
+        "_any_weekday",
+    )
+
+    def __init__(self, expression: str) -> None:
+        self.expression = expression
+        fields = ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(
+                f"Invalid cron expression {expression!r}, expected 5 fields."
+            )
+
+        try:
+            minute, hour, day, month, weekday = fields
+            self.minutes = _parse_field(minute, 0, 59)
+            self.hours = _parse_field(hour, 0, 23)
+            self.days = _parse_field(day, 1, 31)
+            self.months = _parse_field(month, 1, 12, MONTH_NAMES)
+            weekdays = _parse_field(weekday, 0, 7, DAY_NAMES)
+        except ValueError as error:
+            raise ValueError(
+                f"Invalid cron expression {expression!r}: {error}"
+            ) from None
+
+        # Both 0 and 7 mean Sunday. Converted to Python's weekday numbering,
+        # where Monday is 0.
+        self.weekdays = frozenset((day - 1) % 7 for day in weekdays)
+        self._any_day = day.startswith("*")
+        self._any_weekday = weekday.startswith("*")
+
+    def __repr__(self) -> str:
+        return f"<CronExpression {self.expression!r}>"
+
+    def __str__(self) -> str:
+        return self.expression
+
+    def _day_matches(self, date: datetime.datetime) -> bool:
+        day = date.day in self.days
+        weekday = date.weekday() in self.weekdays
+
+        if self._any_day and self._any_weekday:
+            return True
+        if self._any_day:
+            return weekday
+        if self._any_weekday:
+            return day
+        return day or weekday
+
+    def next_after(self, after: datetime.datetime) -> datetime.datetime:
+        """Return the first time matching the expression that is strictly after
+        ``after``. The time zone of ``after`` (if any) is kept.
+        """
+        current = after.replace(second=0, microsecond=0)
+        current += datetime.timedelta(minutes=1)
+        limit = current + datetime.timedelta(days=MAX_SEARCH_DAYS)
+
+        while current < limit:
+            if current.month not in self.months:
+                # Skip to the start of the next month.
+                year, month = divmod(current.month, 12)
+                current = current.replace(
+                    year=current.year + year, month=month + 1, day=1, hour=0, minute=0
+                )
+                continue
+
+            if not self._day_matches(current):
+                current = current.replace(hour=0, minute=0)
+                current += datetime.timedelta(days=1)
+                continue
+
+            if current.hour not in self.hours:
+                current = current.replace(minute=0) + datetime.timedelta(hours=1)
+                continue
+
+            if current.minute not in self.minutes:
+                current += datetime.timedelta(minutes=1)
+                continue
+
+            return current
+
+        raise ValueError(f"Cron expression {self.expression!r} never matches.")
@@ -11,6 +11,7 @@ import discord
 from discord.ext import commands
 
 import lifesaver
+from lifesaver.bot.concurrency import ConcurrencyLimitExceeded
 from lifesaver.bot.storage import AsyncJSONStorage
 from lifesaver.utils import (
     codeblock,
@@ -62,6 +63,10 @@ class Errors(lifesaver.Cog):
             ),
             (commands.NotOwner, ("Only of the owner of this bot can do that.", False)),
             (commands.DisabledCommand, ("This command has been disabled.", False)),
+            (
+                ConcurrencyLimitExceeded,
+                ("I'm too busy to do that right now. Try again later.", False),
+            ),
             (commands.UserInputError, ("User input error", True)),
             (commands.CheckFailure, ("Permissions error", True)),
             (
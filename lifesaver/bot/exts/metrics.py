@@ -0,0 +1,263 @@
+# encoding: utf-8
+
+import io
+import json
+import math
+
+import discord
+from discord.ext import commands
+
+import lifesaver
+from lifesaver.utils import Table, codeblock, format_seconds, memory_usage
+
+
+class Metrics(lifesaver.Cog):
+    @lifesaver.group(hidden=True, hollow=True)
+    @commands.is_owner()
+    async def metrics(self, ctx: lifesaver.commands.Context):
+        """Views bot metrics."""
+
+    @metrics.command(name="commands")
+    async def metrics_commands(self, ctx: lifesaver.commands.Context, amount: int = 15):
+        """Shows the slowest commands by p99 latency."""
+        metrics = ctx.bot.command_metrics
+        if metrics is None:
+            await ctx.send("Command metrics are disabled.")
+            return
+
+        if not metrics.commands:
+            await ctx.send("No commands have been invoked yet.")
+            return
+
+        slowest = sorted(
+            metrics.commands.values(),
+            key=lambda stats: stats.latency.quantile(0.99),
+            reverse=True,
+        )[:amount]
+
+        table = Table("Command", "Calls", "Errors", "Running", "Mean", "p50", "p99")
+        for stats in slowest:
+            latency = stats.latency
+            table.add_row(
+                stats.name,
+                str(stats.invocations),
+                str(sum(stats.errors.values())),
+                str(stats.in_flight),
+                format_seconds(latency.mean),
+                format_seconds(latency.quantile(0.5)),
+                format_seconds(latency.quantile(0.99)),
+            )
+
+        await ctx.send(codeblock(await table.render()))
+
+    @metrics.command(name="concurrency")
+    async def metrics_concurrency(self, ctx: lifesaver.commands.Context):
+        """Shows command concurrency and queueing."""
+        limiter = ctx.bot.concurrency
+        if limiter is None:
+            await ctx.send("Concurrency limits are disabled.")
+            return
+
+        wait_times = limiter.wait_times
+        lines = [
+            f"Running: {limiter.active}",
+            f"Queued: {limiter.queued} (peak: {limiter.max_queue_depth})",
+            f"Wait p50: {format_seconds(wait_times.quantile(0.5))}, "
+            f"p99: {format_seconds(wait_times.quantile(0.99))}",
+        ]
+
+        if limiter.rejections:
+            lines.append("Rejections:")
+            lines.extend(
+                f"  {reason}: {count}"
+                for (reason, count) in limiter.rejections.most_common()
+            )
+
+        await ctx.send(codeblock("\n".join(lines)))
+
+    @metrics.command(name="schedule")
+    async def metrics_schedule(self, ctx: lifesaver.commands.Context):
+        """Shows scheduled jobs, by when they are next due."""
+        scheduler = ctx.bot.scheduler
+        jobs = scheduler.jobs
+        if not jobs:
+            await ctx.send("Nothing is scheduled.")
+            return
+
+        now = scheduler.loop.time()
+        table = Table(
+            "Job", "Trigger", "Next", "Last", "Mean", "p99", "Lag p99", "Runs", "Errors"
+        )
+        for job in jobs:
+            if job.running:
+                next_run = "running"
+            elif job.next_run is None:
+                next_run = "-"
+            else:
+                next_run = format_seconds(max(job.next_run - now, 0))
+
+            errors = str(job.failures)
+            if job.timeouts:
+                errors += f" ({job.timeouts} timed out)"
+
+            durations = job.durations
+            last_duration = job.last_duration
+            table.add_row(
+                job.name,
+                job.trigger,
+                next_run,
+                format_seconds(last_duration) if last_duration is not None else "-",
+                format_seconds(durations.mean) if durations.count else "-",
+                format_seconds(durations.quantile(0.99)) if durations.count else "-",
+                format_seconds(job.lags.quantile(0.99)) if job.lags.count else "-",
+                str(job.runs),
+                errors,
+            )
+
+        await ctx.send(codeblock(await table.render()))
+
+    @metrics.command(name="processes")
+    async def metrics_processes(self, ctx: lifesaver.commands.Context):
+        """Shows the usage of the worker process pool."""
+        processes = ctx.bot.processes
+        if not processes.started:
+            await ctx.send("No worker processes have been started.")
+            return
+
+        run_times = processes.run_times
+        lines = [
+            f"Workers: {processes.workers}",
+            f"In flight: {processes.in_flight} (peak: {processes.max_in_flight})",
+            f"Calls: {run_times.count}",
+            f"Time p50: {format_seconds(run_times.quantile(0.5))}, "
+            f"p99: {format_seconds(run_times.quantile(0.99))}",
+        ]
+
+        if processes.errors:
+            lines.append("Errors:")
+            lines.extend(
+                f"  {error}: {count}"
+                for (error, count) in processes.errors.most_common()
+            )
+
+        await ctx.send(codeblock("\n".join(lines)))
+
+    @metrics.command(name="pool")
+    async def metrics_pool(self, ctx: lifesaver.commands.Context):
+        """Shows Postgres pool usage and query latency."""
+        pool = ctx.bot.pool
+        if pool is None:
+            await ctx.send("There is no Postgres pool.")
+            return
+
+        acquire_times = pool.acquire_times
+        lines = [
+            f"Size: {pool.size} (idle: {pool.idle})",
+            f"In use: {pool.in_use} (peak: {pool.max_in_use})",
+            f"Waiting: {pool.waiting}",
+            f"Acquire p50: {format_seconds(acquire_times.quantile(0.5))}, "
+            f"p99: {format_seconds(acquire_times.quantile(0.99))}",
+        ]
+
+        if pool.errors:
+            lines.append("Errors:")
+            lines.extend(
+                f"  {error}: {count}" for (error, count) in pool.errors.most_common()
+            )
+
+        table = Table("Method", "Queries", "Mean", "p50", "p99")
+        for (method, latency) in pool.query_times.items():
+            if not latency.count:
+                continue
+            table.add_row(
+                method,
+                str(latency.count),
+                format_seconds(latency.mean),
+                format_seconds(latency.quantile(0.5)),
+                format_seconds(latency.quantile(0.99)),
+            )
+
+        text = "\n".join(lines) + "\n\n" + await table.render()
+        await ctx.send(codeblock(text))
+
+    @metrics.command(name="memory", aliases=["cache"])
+    async def metrics_memory(self, ctx: lifesaver.commands.Context):
+        """Shows memory usage and cache sizes."""
+        bot = ctx.bot
+        state = bot._connection
+
+        table = Table("Cache", "Size")
+        for (name, size) in bot.cache_stats().items():
+            table.add_row(name, str(size))
+
+        flags = state.member_cache_flags
+        member_cache = [
+            flag
+            for flag in discord.MemberCacheFlags.VALID_FLAGS
+            if getattr(flags, flag)
+        ]
+        lines = [
+            f"Max messages: {state.max_messages}",
+            f"Member cache: {', '.join(member_cache) or 'disabled'}",
+            f"Chunking guilds at startup: {state._chunk_guilds}",
+        ]
+
+        memory = memory_usage()
+        if memory is not None:
+            lines.insert(0, f"Memory: {memory / 1024 ** 2:.1f} MiB")
+
+        text = "\n".join(lines) + "\n\n" + await table.render()
+        await ctx.send(codeblock(text))
+
+    @metrics.command(name="clusters")
+    async def metrics_clusters(self, ctx: lifesaver.commands.Context):
+        """Shows the stats of every cluster."""
+        if ctx.bot.cluster is None:
+            await ctx.send("This bot isn't running as a cluster.")
+            return
+
+        clusters = await ctx.bot.cluster.fetch_stats()
+
+        table = Table("Cluster", "Shards", "Status", "Guilds", "Latency", "Memory")
+        for (cluster_id, stats) in sorted(clusters.items()):
+            shard_ids = stats["shard_ids"]
+            if not stats["alive"]:
+                status = "down"
+            elif stats.get("ready"):
+                status = "ready"
+            else:
+                status = "starting"
+
+            memory = stats.get("memory")
+            latency = stats.get("latency")
+            # Shards that haven't connected yet have a latency of NaN.
+            if latency is not None and math.isnan(latency):
+                latency = None
+
+            table.add_row(
+                str(cluster_id),
+                f"{shard_ids[0]}-{shard_ids[-1]}",
+                status,
+                str(stats.get("guilds", 0)),
+                format_seconds(latency) if latency is not None else "-",
+                f"{memory / 1024 ** 2:.1f} MiB" if memory else "-",
+            )
+
+        await ctx.send(codeblock(await table.render()))
+
+    @metrics.command(name="export")
+    async def metrics_export(self, ctx: lifesaver.commands.Context):
+        """Exports all metrics as JSON."""
+        data = json.dumps(ctx.bot.collect_metrics(), indent=2).encode()
+        await ctx.send(file=discord.File(io.BytesIO(data), "metrics.json"))
+
+    @metrics.command(name="reset")
+    async def metrics_reset(self, ctx: lifesaver.commands.Context):
+        """Resets command metrics."""
+        if ctx.bot.command_metrics is not None:
+            ctx.bot.command_metrics.reset()
+        await ctx.ok()
+
+
+def setup(bot):
+    bot.add_cog(Metrics(bot))
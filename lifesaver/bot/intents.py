@@ -0,0 +1,222 @@
+# encoding: utf-8
+
+"""Deriving the minimal gateway intents that a bot needs."""
+
+__all__ = [
+    "EVENT_INTENTS",
+    "MEMBER_CACHE_INTENTS",
+    "PRIVILEGED_INTENTS",
+    "IntentsReport",
+    "derive_intents",
+]
+
+import inspect
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+import discord
+
+#: The intent required to receive each event, keyed by event name (without the
+#: ``on_`` prefix). Events that aren't listed don't require an intent.
+EVENT_INTENTS: Dict[str, str] = {
+    **dict.fromkeys(
+        [
+            "guild_join",
+            "guild_remove",
+            "guild_update",
+            "guild_available",
+            "guild_unavailable",
+            "guild_channel_create",
+            "guild_channel_delete",
+            "guild_channel_update",
+            "guild_channel_pins_update",
+            "guild_role_create",
+            "guild_role_delete",
+            "guild_role_update",
+        ],
+        "guilds",
+    ),
+    **dict.fromkeys(
+        ["member_join", "member_remove", "member_update", "user_update"], "members"
+    ),
+    **dict.fromkeys(["member_ban", "member_unban"], "bans"),
+    "guild_emojis_update": "emojis",
+    "guild_integrations_update": "integrations",
+    "webhooks_update": "webhooks",
+    **dict.fromkeys(["invite_create", "invite_delete"], "invites"),
+    "voice_state_update": "voice_states",
+    **dict.fromkeys(
+        [
+            "message",
+            "message_edit",
+            "message_delete",
+            "bulk_message_delete",
+            "raw_message_edit",
+            "raw_message_delete",
+            "raw_bulk_message_delete",
+            "private_channel_pins_update",
+        ],
+        "messages",
+    ),
+    **dict.fromkeys(
+        [
+            "reaction_add",
+            "reaction_remove",
+            "reaction_clear",
+            "reaction_clear_emoji",
+            "raw_reaction_add",
+            "raw_reaction_remove",
+            "raw_reaction_clear",
+            "raw_reaction_clear_emoji",
+        ],
+        "reactions",
+    ),
+    "typing": "typing",
+}
+
+#: The intent required by each :class:`discord.MemberCacheFlags` flag.
+MEMBER_CACHE_INTENTS = {
+    "online": "presences",
+    "voice": "voice_states",
+    "joined": "members",
+}
+
+#: Intents that must be enabled in the developer portal before they can be used.
+PRIVILEGED_INTENTS = frozenset({"members", "presences"})
+
+#: Intents that are always enabled, and why.
+BASELINE_INTENTS = {
+    "guilds": "required to cache guilds, channels, and roles",
+    "reactions": "used by reaction menus (e.g. paginators and buttons)",
+}
+
+
+class IntentsReport:
+    """The intents derived by :func:`derive_intents`, and why each was enabled."""
+
+    def __init__(self) -> None:
+        #: The derived intents.
+        self.intents = discord.Intents.none()
+
+        #: Why each enabled intent was enabled, keyed by intent.
+        self.reasons: Dict[str, List[str]] = defaultdict(list)
+
+        #: Why each privileged intent that wasn't allowed would have been
+        #: enabled, keyed by intent.
+        self.skipped: Dict[str, List[str]] = defaultdict(list)
+
+    def __repr__(self) -> str:
+        return (
+            f"<IntentsReport enabled={self.enabled!r} "
+            f"skipped={sorted(self.skipped)!r}>"
+        )
+
+    @property
+    def enabled(self) -> List[str]:
+        """Return the names of the enabled intents."""
+        return sorted(self.reasons)
+
+    def require(self, intent: str, reason: str, *, privileged: Iterable[str]) -> None:
+        """Enable an intent, unless it is privileged and not allowed."""
+        if intent in PRIVILEGED_INTENTS and intent not in privileged:
+            self.skipped[intent].append(reason)
+            return
+
+        setattr(self.intents, intent, True)
+        self.reasons[intent].append(reason)
+
+    def __str__(self) -> str:
+        lines = ["Intents derived from the loaded extensions:"]
+
+        for intent in self.enabled:
+            lines.append(f"  {intent}: {', '.join(self.reasons[intent])}")
+
+        for intent, reasons in sorted(self.skipped.items()):
+            lines.append(f"  {intent} (privileged, not allowed): {', '.join(reasons)}")
+
+        return "\n".join(lines)
+
+
+def _owner(func) -> str:
+    owner = getattr(func, "__self__", None)
+    if owner is not None:
+        return type(owner).__name__
+    return func.__module__
+
+
+def derive_intents(
+    bot,
+    *,
+    privileged: Iterable[str] = (),
+    include: Iterable[str] = (),
+    member_cache: Iterable[str] = (),
+    chunk_guilds: bool = False,
+) -> IntentsReport:
+    """Derive the minimal intents that a bot needs from its listeners and
+    commands.
+
+    Listeners are the bot's own ``on_`` methods, and every listener added with
+    :meth:`discord.ext.commands.Bot.add_listener` (which includes the listeners
+    of cogs and of deferred extensions).
+
+    Parameters
+    ----------
+    bot
+        The bot to inspect.
+    privileged
+        The privileged intents that may be enabled. Privileged intents that are
+        needed but not allowed are recorded in :attr:`IntentsReport.skipped`.
+    include
+        Intents to enable regardless of whether they are needed.
+    member_cache
+        The :class:`discord.MemberCacheFlags` flags that should be usable.
+    chunk_guilds
+        Whether guilds should be chunked when connecting, which requires the
+        ``members`` intent.
+    """
+    privileged = set(privileged)
+    report = IntentsReport()
+
+    for intent, reason in BASELINE_INTENTS.items():
+        report.require(intent, reason, privileged=privileged)
+
+    for intent in include:
+        report.require(intent, "included by config", privileged=privileged)
+
+    for flag in member_cache:
+        report.require(
+            MEMBER_CACHE_INTENTS[flag], f"member cache ({flag})", privileged=privileged
+        )
+
+    if chunk_guilds:
+        report.require("members", "chunk_guilds_at_startup", privileged=privileged)
+
+    if bot.commands:
+        report.require(
+            "messages", f"{len(bot.commands)} commands", privileged=privileged
+        )
+
+    owners: Dict[str, List[str]] = defaultdict(list)
+
+    for name, _ in inspect.getmembers(type(bot), inspect.iscoroutinefunction):
+        if name.startswith("on_"):
+            owner = next(cls for cls in type(bot).__mro__ if name in vars(cls))
+            owners[name[3:]].append(owner.__name__)
+
+    # Events registered with the bot.event decorator.
+    for name, value in vars(bot).items():
+        if name.startswith("on_") and inspect.iscoroutinefunction(value):
+            owners[name[3:]].append(_owner(value))
+
+    for event, listeners in bot.extra_events.items():
+        owners[event[3:]].extend(_owner(listener) for listener in listeners)
+
+    for event, event_owners in sorted(owners.items()):
+        intent = EVENT_INTENTS.get(event)
+        if intent is None:
+            continue
+
+        reason = f"on_{event} ({', '.join(sorted(set(event_owners)))})"
+        report.require(intent, reason, privileged=privileged)
+
+    return report
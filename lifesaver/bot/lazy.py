@@ -0,0 +1,296 @@
+# encoding: utf-8
+
+"""Deferred extension loading."""
+
+__all__ = ["LazyCommand", "LazyExtension", "LazyExtensions", "scan_extension"]
+
+import ast
+import importlib.util
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+COMMAND_DECORATORS = {"command", "group"}
+COMMAND_MODULES = {"lifesaver", "commands"}
+
+
+class LazyCommand:
+    """The name, aliases, and help of a command that hasn't been loaded yet."""
+
+    def __init__(
+        self, name: str, *, aliases: List[str], help: Optional[str], hidden: bool
+    ) -> None:
+        self.name = name
+        self.aliases = aliases
+        self.help = help
+        self.hidden = hidden
+
+    def __repr__(self) -> str:
+        return f"<LazyCommand name={self.name!r} aliases={self.aliases!r}>"
+
+
+class LazyExtension:
+    """A lightweight manifest of what an extension provides.
+
+    It is built by statically inspecting the extension's source with
+    :func:`scan_extension`, so nothing is imported.
+    """
+
+    def __init__(self, name: str, commands: List[LazyCommand], listeners: Set[str]):
+        #: The name of the extension.
+        self.name = name
+
+        #: The top-level commands that the extension registers.
+        self.commands = commands
+
+        #: The names of the events that the extension listens to, including
+        #: the ``on_`` prefix.
+        self.listeners = listeners
+
+    def __repr__(self) -> str:
+        return (
+            f"<LazyExtension name={self.name!r} commands={self.commands!r} "
+            f"listeners={self.listeners!r}>"
+        )
+
+
+def _decorator_name(node: ast.expr) -> Optional[str]:
+    """Return the name of a top-level command decorator, if it is one.
+
+    Subcommand decorators (like ``@group.command()``) aren't considered.
+    """
+    if isinstance(node, ast.Call):
+        node = node.func
+
+    if isinstance(node, ast.Name) and node.id in COMMAND_DECORATORS:
+        return node.id
+
+    if isinstance(node, ast.Attribute) and node.attr in COMMAND_DECORATORS:
+        owner = node.value
+        if isinstance(owner, ast.Name) and owner.id in COMMAND_MODULES:
+            return node.attr
+        if isinstance(owner, ast.Attribute) and owner.attr in COMMAND_MODULES:
+            return node.attr
+
+    return None
+
+
+def _is_listener_decorator(node: ast.expr) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "listener"
+    )
+
+
+def _keyword(call: ast.expr, name: str) -> Optional[ast.expr]:
+    if not isinstance(call, ast.Call):
+        return None
+    return next((kw.value for kw in call.keywords if kw.arg == name), None)
+
+
+def _constant(node: Optional[ast.expr]):
+    if node is None:
+        return None
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def _scan_function(
+    node: ast.AST, found_commands: List[LazyCommand], listeners: Set[str]
+) -> None:
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return
+
+    for decorator in node.decorator_list:
+        if _is_listener_decorator(decorator):
+            event = decorator.args[0] if decorator.args else _keyword(decorator, "name")
+            listeners.add(_constant(event) or node.name)
+            continue
+
+        if _decorator_name(decorator) is None:
+            continue
+
+        name = _keyword(decorator, "name")
+        if name is None and isinstance(decorator, ast.Call) and decorator.args:
+            name = decorator.args[0]
+
+        docstring = ast.get_docstring(node)
+        found_commands.append(
+            LazyCommand(
+                _constant(name) or node.name,
+                aliases=list(_constant(_keyword(decorator, "aliases")) or []),
+                help=docstring,
+                hidden=bool(_constant(_keyword(decorator, "hidden"))),
+            )
+        )
+
+
+def scan_extension(name: str, source: Path) -> LazyExtension:
+    """Statically build a :class:`LazyExtension` from an extension's source file."""
+    tree = ast.parse(source.read_bytes(), filename=str(source))
+
+    found_commands: List[LazyCommand] = []
+    listeners: Set[str] = set()
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            for child in node.body:
+                _scan_function(child, found_commands, listeners)
+        else:
+            _scan_function(node, found_commands, listeners)
+
+    return LazyExtension(name, found_commands, listeners)
+
+
+class LazyExtensions:
+    """Manages extensions whose loading is deferred until they're needed.
+
+    Instead of loading a lazy extension, placeholder commands are registered in
+    place of the extension's commands, and placeholder listeners are registered
+    in place of the extension's listeners. When any of them are triggered, the
+    real extension is loaded and the command or event is forwarded to it.
+    """
+
+    def __init__(self, bot) -> None:
+        self.bot = bot
+
+        #: The extensions that haven't been loaded yet, keyed by name.
+        self.pending: Dict[str, LazyExtension] = {}
+
+        self._placeholders: Dict[str, List[commands.Command]] = {}
+        # Every placeholder command, for quick membership checks.
+        self._placeholder_set: Set[commands.Command] = set()
+        self._proxies: Dict[str, List[tuple]] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.pending
+
+    def register(self, name: str) -> bool:
+        """Defer the loading of an extension.
+
+        Returns whether the extension was deferred. Extensions that can't be
+        statically inspected, or that don't seem to provide any commands or
+        listeners, aren't deferred and should be loaded normally.
+        """
+        spec = importlib.util.find_spec(name)
+        if spec is None or spec.origin is None or not spec.origin.endswith(".py"):
+            return False
+
+        try:
+            extension = scan_extension(name, Path(spec.origin))
+        except (SyntaxError, ValueError, OSError):
+            log.exception("Failed to inspect %s, not deferring it:", name)
+            return False
+
+        if not extension.commands and not extension.listeners:
+            return False
+
+        self.discard(name)
+        self.pending[name] = extension
+        self._add_placeholders(extension)
+        log.debug("Deferred loading of %r.", extension)
+        return True
+
+    def discard(self, name: str) -> None:
+        """Stop deferring an extension without loading it."""
+        self._remove_placeholders(name)
+        self.pending.pop(name, None)
+
+    def load(self, name: str) -> None:
+        """Load a deferred extension now. Does nothing if it was already loaded."""
+        extension = self.pending.pop(name, None)
+        if extension is None:
+            return
+
+        log.info("Loading deferred extension %s.", name)
+        self._remove_placeholders(name)
+
+        try:
+            self.bot.load_extension(name)
+        except Exception:
+            # Keep the extension deferred so that it can be attempted again.
+            self.pending[name] = extension
+            self._add_placeholders(extension)
+            raise
+
+    def is_placeholder(self, command: commands.Command) -> bool:
+        """Return whether a command is a placeholder for a deferred extension."""
+        return command in self._placeholder_set
+
+    def load_all(self) -> None:
+        """Load every deferred extension."""
+        for name in list(self.pending):
+            self.load(name)
+
+    def _add_placeholders(self, extension: LazyExtension) -> None:
+        name = extension.name
+
+        async def load_and_invoke(ctx):
+            self.load(name)
+
+            # Now that the real command is registered, process the message again.
+            # This already runs within BotBase.invoke, so the real command is
+            # invoked without going through it again, which would stop tracking
+            # this invocation when the inner call finishes.
+            real_ctx = await ctx.bot.get_context(ctx.message, cls=ctx.bot.context_cls)
+            await ctx.bot._invoke_limited(real_ctx)
+
+        placeholders = []
+        for lazy_command in extension.commands:
+            if self.bot.get_command(lazy_command.name) is not None:
+                continue
+
+            placeholder = commands.Command(
+                load_and_invoke,
+                name=lazy_command.name,
+                aliases=lazy_command.aliases,
+                help=lazy_command.help,
+                hidden=lazy_command.hidden,
+                ignore_extra=True,
+            )
+            self.bot.add_command(placeholder)
+            placeholders.append(placeholder)
+
+        proxies = []
+        for event in extension.listeners:
+            proxy = self._make_proxy(name, event)
+            self.bot.add_listener(proxy, event)
+            proxies.append((proxy, event))
+
+        self._placeholders[name] = placeholders
+        self._placeholder_set.update(placeholders)
+        self._proxies[name] = proxies
+
+    def _remove_placeholders(self, name: str) -> None:
+        for placeholder in self._placeholders.pop(name, []):
+            self._placeholder_set.discard(placeholder)
+            if self.bot.all_commands.get(placeholder.name) is placeholder:
+                self.bot.remove_command(placeholder.name)
+
+        for (proxy, event) in self._proxies.pop(name, []):
+            self.bot.remove_listener(proxy, event)
+
+    def _make_proxy(self, name: str, event: str):
+        async def proxy(*args, **kwargs):
+            self.load(name)
+
+            # The real listeners weren't registered when this event was
+            # dispatched, so forward the event to them manually. This covers
+            # the listeners of the extension's cogs as well as those added with
+            # add_listener in its setup function.
+            for listener in list(self.bot.extra_events.get(event, [])):
+                module = getattr(listener, "__module__", None) or ""
+                if module == name or module.startswith(name + "."):
+                    await listener(*args, **kwargs)
+
+        proxy.__name__ = event
+        # Attribute the proxy to the extension that it stands in for.
+        proxy.__module__ = name
+        return proxy
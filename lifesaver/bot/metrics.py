@@ -0,0 +1,132 @@
+# encoding: utf-8
+
+"""Command invocation metrics."""
+
+__all__ = ["CommandStats", "CommandMetrics", "PHASES"]
+
+from collections import Counter
+from typing import Any, Dict
+
+from lifesaver.utils.timing import Histogram
+
+#: The phases of a command invocation that are timed separately.
+PHASES = ("parse", "checks", "callback")
+
+
+class CommandStats:
+    """The aggregated metrics of a single command."""
+
+    __slots__ = ("name", "latency", "phases", "invocations", "errors", "in_flight")
+
+    def __init__(self, name: str) -> None:
+        #: The qualified name of the command.
+        self.name = name
+
+        #: The total time taken by each invocation.
+        self.latency = Histogram()
+
+        #: The time taken by each phase of each invocation, keyed by phase. See
+        #: :data:`PHASES`.
+        self.phases = {phase: Histogram() for phase in PHASES}
+
+        #: The number of completed invocations.
+        self.invocations = 0
+
+        #: The number of failed invocations, keyed by the name of the error.
+        self.errors: Counter = Counter()
+
+        #: The number of invocations currently running.
+        self.in_flight = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<CommandStats name={self.name!r} invocations={self.invocations} "
+            f"in_flight={self.in_flight}>"
+        )
+
+    def reset(self) -> None:
+        """Forget every recorded invocation, keeping :attr:`in_flight`."""
+        self.latency = Histogram()
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.invocations = 0
+        self.errors.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serializable representation of these metrics."""
+        return {
+            "invocations": self.invocations,
+            "errors": dict(self.errors),
+            "in_flight": self.in_flight,
+            "latency": self.latency.to_dict(),
+            "phases": {
+                phase: histogram.to_dict() for (phase, histogram) in self.phases.items()
+            },
+        }
+
+
+class CommandMetrics:
+    """Per-command latency histograms, error counts, and in-flight gauges.
+
+    Invocations are recorded by :meth:`lifesaver.bot.BotBase.invoke`. The
+    parsing and check phases are timed by :class:`lifesaver.commands.Command`
+    and collected in :attr:`lifesaver.commands.Context.timings`; the callback
+    phase is whatever remains of the total.
+    """
+
+    def __init__(self) -> None:
+        #: The metrics of each command, keyed by qualified name.
+        self.commands: Dict[str, CommandStats] = {}
+
+    def __repr__(self) -> str:
+        return f"<CommandMetrics commands={len(self.commands)}>"
+
+    def get(self, name: str) -> CommandStats:
+        """Return the metrics of a command, creating them if necessary."""
+        try:
+            return self.commands[name]
+        except KeyError:
+            stats = self.commands[name] = CommandStats(name)
+            return stats
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of invocations currently running."""
+        return sum(stats.in_flight for stats in self.commands.values())
+
+    def record(self, ctx, duration: float) -> None:
+        """Record a finished invocation of ``ctx.command`` that took ``duration``
+        seconds in total.
+        """
+        stats = self.get(ctx.command.qualified_name)
+        stats.invocations += 1
+        stats.latency.record(duration)
+
+        timings = getattr(ctx, "timings", {})
+        remaining = duration
+        for phase in ("parse", "checks"):
+            elapsed = timings.get(phase)
+            if elapsed is not None:
+                stats.phases[phase].record(elapsed)
+                remaining -= elapsed
+        stats.phases["callback"].record(max(remaining, 0.0))
+
+        if ctx.command_failed:
+            error = getattr(ctx, "error", None)
+            # Count the exceptions raised by callbacks by their actual type.
+            error = getattr(error, "original", error)
+            name = type(error).__name__ if error is not None else "CommandError"
+            stats.errors[name] += 1
+
+    def reset(self) -> None:
+        """Forget every recorded invocation. In-flight gauges are kept."""
+        for name, stats in list(self.commands.items()):
+            if stats.in_flight:
+                # Running invocations hold on to their stats to decrement the
+                # gauge when they finish, so those are reset in place.
+                stats.reset()
+            else:
+                del self.commands[name]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serializable representation of these metrics."""
+        return {name: stats.to_dict() for (name, stats) in self.commands.items()}
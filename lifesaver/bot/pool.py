@@ -0,0 +1,304 @@
+# encoding: utf-8
+
+"""Creating and instrumenting the Postgres connection pool."""
+
+__all__ = ["QUERY_METHODS", "InstrumentedPool", "resolve_hook", "create_pool"]
+
+import asyncio
+import importlib
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from lifesaver.config import ConfigError
+from lifesaver.utils.timing import Histogram
+
+if TYPE_CHECKING:
+    import asyncpg
+
+#: The query methods of :class:`asyncpg.pool.Pool` whose latency is recorded.
+QUERY_METHODS = ("execute", "executemany", "fetch", "fetchrow", "fetchval")
+
+ConnectionHook = Callable[["asyncpg.Connection"], Awaitable[None]]
+
+
+class _AcquireContext:
+    # Like the return value of asyncpg.pool.Pool.acquire, this can be awaited
+    # or used as an async context manager.
+
+    __slots__ = ("pool", "timeout", "connection")
+
+    def __init__(self, pool: "InstrumentedPool", timeout: Optional[float]) -> None:
+        self.pool = pool
+        self.timeout = timeout
+        self.connection: Optional["asyncpg.Connection"] = None
+
+    def __await__(self):
+        return self.pool._acquire(self.timeout).__await__()
+
+    async def __aenter__(self) -> "asyncpg.Connection":
+        self.connection = await self.pool._acquire(self.timeout)
+        return self.connection
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.pool.release(self.connection)
+
+
+class InstrumentedPool:
+    """Wraps an :class:`asyncpg.pool.Pool`, recording metrics about it.
+
+    The wrapper can be used like the pool itself. Attributes that aren't
+    defined here are looked up on the wrapped pool, which is available as
+    :attr:`pool`.
+
+    The wrapper can be created before the pool is, and connected later with
+    :meth:`connect`. Until then, acquiring a connection and querying wait for
+    the pool to connect, and raise the error that it failed with if it did.
+
+    The latency of the query methods of the pool (see :data:`QUERY_METHODS`) is
+    recorded per method. Queries made on a connection acquired with
+    :meth:`acquire` aren't timed individually, but the time that the connection
+    was held for is.
+    """
+
+    def __init__(self, pool: Optional["asyncpg.pool.Pool"] = None) -> None:
+        #: The wrapped pool, or ``None`` if it hasn't connected yet.
+        self.pool = pool
+
+        #: The time taken to acquire connections.
+        self.acquire_times = Histogram()
+
+        #: The time that connections were held for before being released.
+        self.hold_times = Histogram()
+
+        #: The latency of queries made with the query methods of the pool, keyed
+        #: by method.
+        self.query_times: Dict[str, Histogram] = {
+            method: Histogram() for method in QUERY_METHODS
+        }
+
+        #: The number of failures, keyed by operation and the name of the error
+        #: (e.g. ``"fetch: QueryCanceledError"``).
+        self.errors: Counter = Counter()
+
+        #: The number of connections currently acquired.
+        self.in_use = 0
+
+        #: The largest number of connections that have been acquired at once.
+        self.max_in_use = 0
+
+        #: The number of tasks currently waiting for a connection.
+        self.waiting = 0
+
+        # When each acquired connection was acquired, keyed by id().
+        self._held: Dict[int, float] = {}
+
+        self._connected = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        if pool is not None:
+            self._connected.set()
+
+    def __repr__(self) -> str:
+        return (
+            f"<InstrumentedPool in_use={self.in_use} waiting={self.waiting} "
+            f"size={self.size}>"
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        if self.pool is None and not name.startswith("_"):
+            raise RuntimeError(
+                f"Can't access {name!r}, the pool hasn't connected yet. "
+                "Await wait_until_ready() first."
+            )
+        return getattr(self.pool, name)
+
+    @property
+    def ready(self) -> bool:
+        """Return whether the pool has connected."""
+        return self.pool is not None
+
+    async def connect(self, options: Dict[str, Any]) -> None:
+        """Create the wrapped pool from the ``postgres`` config. See
+        :func:`create_pool`.
+        """
+        try:
+            self.pool = await _create_pool(options)
+        except BaseException as error:
+            self._error = error
+            raise
+        finally:
+            self._connected.set()
+
+    async def wait_until_ready(self) -> None:
+        """Wait for the pool to connect.
+
+        Raises the error that connecting failed with, if it did.
+        """
+        await self._connected.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def close(self) -> None:
+        """Close the pool. See :meth:`asyncpg.pool.Pool.close`."""
+        if self.pool is not None:
+            await self.pool.close()
+
+    def terminate(self) -> None:
+        """Terminate every connection of the pool. See
+        :meth:`asyncpg.pool.Pool.terminate`.
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+
+    @property
+    def size(self) -> Optional[int]:
+        """Return the number of open connections, if the installed version of
+        asyncpg can tell.
+        """
+        get_size = getattr(self.pool, "get_size", None)
+        return get_size() if get_size is not None else None
+
+    @property
+    def idle(self) -> Optional[int]:
+        """Return the number of open connections that aren't acquired, if the
+        installed version of asyncpg can tell.
+        """
+        get_idle_size = getattr(self.pool, "get_idle_size", None)
+        return get_idle_size() if get_idle_size is not None else None
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _AcquireContext:
+        """Acquire a connection from the pool. See
+        :meth:`asyncpg.pool.Pool.acquire`.
+        """
+        return _AcquireContext(self, timeout)
+
+    async def _acquire(self, timeout: Optional[float]) -> "asyncpg.Connection":
+        await self.wait_until_ready()
+
+        start = time.perf_counter()
+        self.waiting += 1
+
+        try:
+            connection = await self.pool.acquire(timeout=timeout)
+        except Exception as error:
+            self.errors[f"acquire: {type(error).__name__}"] += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+        acquired_at = time.perf_counter()
+        self.acquire_times.record(acquired_at - start)
+        self._held[id(connection)] = acquired_at
+        self.in_use += 1
+        self.max_in_use = max(self.max_in_use, self.in_use)
+        return connection
+
+    async def release(
+        self, connection: "asyncpg.Connection", *, timeout: Optional[float] = None
+    ) -> None:
+        """Release a connection back to the pool. See
+        :meth:`asyncpg.pool.Pool.release`.
+        """
+        acquired_at = self._held.pop(id(connection), None)
+        if acquired_at is not None:
+            self.hold_times.record(time.perf_counter() - acquired_at)
+            self.in_use -= 1
+
+        await self.pool.release(connection, timeout=timeout)
+
+    async def _query(self, method: str, *args, **kwargs) -> Any:
+        async with self.acquire() as connection:
+            start = time.perf_counter()
+            try:
+                return await getattr(connection, method)(*args, **kwargs)
+            except Exception as error:
+                self.errors[f"{method}: {type(error).__name__}"] += 1
+                raise
+            finally:
+                self.query_times[method].record(time.perf_counter() - start)
+
+    async def execute(self, query: str, *args, timeout: Optional[float] = None):
+        return await self._query("execute", query, *args, timeout=timeout)
+
+    async def executemany(self, command: str, args, *, timeout: Optional[float] = None):
+        return await self._query("executemany", command, args, timeout=timeout)
+
+    async def fetch(self, query: str, *args, timeout: Optional[float] = None):
+        return await self._query("fetch", query, *args, timeout=timeout)
+
+    async def fetchrow(self, query: str, *args, timeout: Optional[float] = None):
+        return await self._query("fetchrow", query, *args, timeout=timeout)
+
+    async def fetchval(
+        self, query: str, *args, column: int = 0, timeout: Optional[float] = None
+    ):
+        return await self._query(
+            "fetchval", query, *args, column=column, timeout=timeout
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serializable representation of the pool's metrics."""
+        return {
+            "size": self.size,
+            "idle": self.idle,
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "waiting": self.waiting,
+            "errors": dict(self.errors),
+            "acquire_times": self.acquire_times.to_dict(),
+            "hold_times": self.hold_times.to_dict(),
+            "query_times": {
+                method: histogram.to_dict()
+                for (method, histogram) in self.query_times.items()
+            },
+        }
+
+
+def resolve_hook(path: str) -> ConnectionHook:
+    """Resolve a connection hook from a ``module:function`` path."""
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        raise ConfigError(
+            f"Invalid connection hook {path!r}, expected a module:function path."
+        )
+
+    module = importlib.import_module(module_name)
+    try:
+        return getattr(module, attribute)
+    except AttributeError:
+        raise ConfigError(f"Connection hook {path!r} doesn't exist.") from None
+
+
+def _chain(hooks: List[ConnectionHook]) -> Optional[ConnectionHook]:
+    if not hooks:
+        return None
+
+    async def hook(connection: "asyncpg.Connection") -> None:
+        for hook in hooks:
+            await hook(connection)
+
+    return hook
+
+
+async def _create_pool(options: Dict[str, Any]) -> "asyncpg.pool.Pool":
+    import asyncpg
+
+    options = dict(options)
+    init = [resolve_hook(path) for path in options.pop("init", [])]
+    setup = [resolve_hook(path) for path in options.pop("setup", [])]
+
+    return await asyncpg.create_pool(**options, init=_chain(init), setup=_chain(setup))
+
+
+async def create_pool(options: Dict[str, Any]) -> InstrumentedPool:
+    """Create an :class:`InstrumentedPool` from the ``postgres`` config.
+
+    ``init`` and ``setup`` are lists of ``module:function`` paths to connection
+    hooks. ``init`` hooks are called once for each new connection (e.g. to
+    register type codecs), and ``setup`` hooks are called every time that a
+    connection is acquired. Every other option is passed to
+    :func:`asyncpg.create_pool`.
+    """
+    pool = InstrumentedPool()
+    await pool.connect(options)
+    return pool
@@ -0,0 +1,270 @@
+# encoding: utf-8
+
+"""Command prefix matching."""
+
+__all__ = [
+    "PrefixMatcher",
+    "GuildPrefixes",
+    "GuildPrefixBackend",
+    "StorageGuildPrefixBackend",
+    "PostgresGuildPrefixBackend",
+]
+
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .storage import AsyncStorage
+
+# Marks a node in the trie as the end of a prefix.
+_END = ""
+
+
+def _build_trie(prefixes: Iterable[str]) -> Dict[str, Any]:
+    root: Dict[str, Any] = {}
+
+    for prefix in prefixes:
+        node = root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[_END] = True
+
+    return root
+
+
+def _trie_pattern(node: Dict[str, Any]) -> str:
+    branches = [
+        re.escape(char) + _trie_pattern(child)
+        for (char, child) in sorted(node.items())
+        if char != _END
+    ]
+
+    if not branches:
+        return ""
+
+    if len(branches) == 1:
+        pattern = branches[0]
+    else:
+        pattern = "(?:" + "|".join(branches) + ")"
+
+    if _END in node:
+        # A prefix ends here, but a longer one might too. The optional group is
+        # greedy, so longer prefixes are preferred.
+        pattern = "(?:" + pattern + ")?"
+
+    return pattern
+
+
+class PrefixMatcher:
+    """Finds the longest prefix that a string starts with.
+
+    The prefixes are compiled into a trie, which is then compiled into a regular
+    expression. Because every branch of the trie begins with a distinct
+    character, matching never backtracks between prefixes, so it takes time
+    proportional to the length of the matched prefix rather than the number of
+    prefixes.
+
+    Example
+    -------
+
+    .. code:: python3
+
+        matcher = PrefixMatcher(["!", "bot ", "bot? "], case_insensitive=True)
+        matcher.match("BOT? ping")  # "BOT? "
+        matcher.match("hello")  # None
+    """
+
+    def __init__(
+        self, prefixes: Iterable[str], *, case_insensitive: bool = False
+    ) -> None:
+        #: The prefixes, longest first.
+        self.prefixes: List[str] = sorted(set(prefixes), key=len, reverse=True)
+
+        #: Whether prefixes are matched case insensitively.
+        self.case_insensitive = case_insensitive
+
+        keys = self.prefixes
+        if case_insensitive:
+            keys = [prefix.lower() for prefix in keys]
+
+        # An empty trie would match everything, so use a pattern that never does.
+        pattern = _trie_pattern(_build_trie(keys)) if keys else "(?!)"
+
+        flags = re.IGNORECASE if case_insensitive else 0
+        self._pattern = re.compile(pattern, flags)
+
+    def __repr__(self) -> str:
+        return (
+            f"<PrefixMatcher prefixes={self.prefixes!r} "
+            f"case_insensitive={self.case_insensitive!r}>"
+        )
+
+    def match(self, content: str) -> Optional[str]:
+        """Return the longest prefix that ``content`` starts with, or ``None``.
+
+        The prefix is returned as it appears in ``content``, so it may differ in
+        case from the configured prefix when matching case insensitively.
+        """
+        match = self._pattern.match(content)
+        if match is None:
+            return None
+        return match.group()
+
+
+class GuildPrefixBackend(ABC):
+    """Where per-guild prefixes are persisted. See :class:`GuildPrefixes`."""
+
+    @abstractmethod
+    async def fetch(self, guild_id: int) -> Optional[List[str]]:
+        """Return the prefixes of a guild, or ``None`` if it has none."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def store(self, guild_id: int, prefixes: Optional[List[str]]) -> None:
+        """Persist the prefixes of a guild. ``None`` removes them."""
+        raise NotImplementedError
+
+
+class StorageGuildPrefixBackend(GuildPrefixBackend):
+    """Persists per-guild prefixes to a :class:`lifesaver.bot.storage.AsyncStorage`,
+    keyed by guild ID.
+    """
+
+    def __init__(self, storage: AsyncStorage) -> None:
+        self.storage = storage
+
+    async def fetch(self, guild_id: int) -> Optional[List[str]]:
+        return self.storage.get(str(guild_id))
+
+    async def store(self, guild_id: int, prefixes: Optional[List[str]]) -> None:
+        await self.storage.put(str(guild_id), prefixes)
+
+
+class PostgresGuildPrefixBackend(GuildPrefixBackend):
+    """Persists per-guild prefixes to a Postgres table through
+    :attr:`lifesaver.bot.BotBase.pool`.
+
+    The table is expected to look like this:
+
+    .. code:: sql
+
+        CREATE TABLE guild_prefixes (
+            guild_id bigint PRIMARY KEY,
+            prefixes text[] NOT NULL
+        );
+    """
+
+    def __init__(self, bot, *, table: str = "guild_prefixes") -> None:
+        self.bot = bot
+        self.table = table
+
+    async def fetch(self, guild_id: int) -> Optional[List[str]]:
+        prefixes = await self.bot.pool.fetchval(
+            f"SELECT prefixes FROM {self.table} WHERE guild_id = $1", guild_id
+        )
+        return list(prefixes) if prefixes is not None else None
+
+    async def store(self, guild_id: int, prefixes: Optional[List[str]]) -> None:
+        if prefixes is None:
+            await self.bot.pool.execute(
+                f"DELETE FROM {self.table} WHERE guild_id = $1", guild_id
+            )
+        else:
+            await self.bot.pool.execute(
+                f"""
+                INSERT INTO {self.table} (guild_id, prefixes) VALUES ($1, $2)
+                ON CONFLICT (guild_id) DO UPDATE SET prefixes = $2
+                """,
+                guild_id,
+                prefixes,
+            )
+
+
+#: Returned by :meth:`GuildPrefixes.peek` when a guild isn't cached.
+MISSING: Any = object()
+
+
+class GuildPrefixes:
+    """A bounded, in-memory cache of per-guild prefix matchers in front of a
+    :class:`GuildPrefixBackend`.
+
+    Guilds are fetched from the backend once and then kept in a least recently
+    used cache of compiled :class:`PrefixMatcher` instances. Guilds without
+    custom prefixes are cached too, as ``None``.
+
+    Parameters
+    ----------
+    backend
+        Where the prefixes are persisted.
+    compile
+        Turns a guild's prefixes into a :class:`PrefixMatcher`.
+    max_size
+        The maximum number of guilds to cache.
+    """
+
+    def __init__(
+        self,
+        backend: GuildPrefixBackend,
+        *,
+        compile: Callable[[List[str]], PrefixMatcher],
+        max_size: int = 10_000,
+    ) -> None:
+        self.backend = backend
+        self.compile = compile
+        self.max_size = max_size
+        self._cache: "OrderedDict[int, Optional[PrefixMatcher]]" = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f"<GuildPrefixes cached={len(self._cache)} max_size={self.max_size}>"
+
+    def _insert(self, guild_id: int, matcher: Optional[PrefixMatcher]) -> None:
+        self._cache[guild_id] = matcher
+        self._cache.move_to_end(guild_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def peek(self, guild_id: int) -> Optional[PrefixMatcher]:
+        """Return the cached matcher of a guild without fetching it.
+
+        Returns ``None`` if the guild has no custom prefixes, and :data:`MISSING`
+        if it isn't cached.
+        """
+        try:
+            matcher = self._cache[guild_id]
+        except KeyError:
+            return MISSING
+        self._cache.move_to_end(guild_id)
+        return matcher
+
+    async def matcher(self, guild_id: int) -> Optional[PrefixMatcher]:
+        """Return the matcher of a guild, fetching it from the backend if it
+        isn't cached. Returns ``None`` if the guild has no custom prefixes.
+        """
+        matcher = self.peek(guild_id)
+        if matcher is not MISSING:
+            return matcher
+
+        prefixes = await self.backend.fetch(guild_id)
+        matcher = self.compile(prefixes) if prefixes else None
+        self._insert(guild_id, matcher)
+        return matcher
+
+    async def get(self, guild_id: int) -> Optional[List[str]]:
+        """Return the custom prefixes of a guild from the backend."""
+        return await self.backend.fetch(guild_id)
+
+    async def set(self, guild_id: int, prefixes: Optional[List[str]]) -> None:
+        """Set the custom prefixes of a guild. ``None`` or an empty list removes
+        them, falling back to the global prefixes.
+        """
+        prefixes = list(prefixes) if prefixes else None
+        await self.backend.store(guild_id, prefixes)
+        self._insert(guild_id, self.compile(prefixes) if prefixes else None)
+
+    def invalidate(self, guild_id: Optional[int] = None) -> None:
+        """Drop a guild from the cache, or every guild if none is specified."""
+        if guild_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(guild_id, None)
@@ -0,0 +1,197 @@
+# encoding: utf-8
+
+"""Running CPU-bound work in a pool of worker processes."""
+
+__all__ = ["ProcessPool"]
+
+import asyncio
+import functools
+import importlib
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+from lifesaver.utils.timing import Histogram
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _initialize(preload: List[str]) -> None:
+    for name in preload:
+        importlib.import_module(name)
+
+
+def _warm() -> int:
+    return os.getpid()
+
+
+class ProcessPool:
+    """A lazily started :class:`concurrent.futures.ProcessPoolExecutor`, which
+    records metrics about the work that it runs.
+
+    Work runs outside of the bot's process, so it doesn't hold the GIL or block
+    the event loop. The function and its arguments are pickled, so the function
+    must be importable from its module (i.e. not a lambda or a closure).
+
+    If a worker dies, the pool is replaced the next time that it's used.
+
+    Parameters
+    ----------
+    loop
+        The event loop to wait for work on.
+    workers
+        The number of worker processes. ``None`` uses the number of CPUs.
+    preload
+        The names of modules that each worker imports when it starts.
+    start_method
+        How workers are started. See :func:`multiprocessing.get_context`.
+    """
+
+    def __init__(
+        self,
+        *,
+        loop: asyncio.AbstractEventLoop,
+        workers: Optional[int] = None,
+        preload: Iterable[str] = (),
+        start_method: str = "spawn",
+    ) -> None:
+        self.loop = loop
+
+        #: The number of worker processes.
+        self.workers = workers or os.cpu_count() or 1
+
+        #: The names of modules that each worker imports when it starts.
+        self.preload = list(preload)
+
+        #: How workers are started.
+        self.start_method = start_method
+
+        #: The time taken by each call of :meth:`run`, including the time spent
+        #: waiting for a free worker.
+        self.run_times = Histogram()
+
+        #: The number of calls that raised an error, keyed by the name of the
+        #: error.
+        self.errors: Counter = Counter()
+
+        #: The number of calls that are currently running or waiting for a
+        #: worker.
+        self.in_flight = 0
+
+        #: The largest number of calls that have been in flight at once.
+        self.max_in_flight = 0
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._closed = False
+
+    def __repr__(self) -> str:
+        return (
+            f"<ProcessPool workers={self.workers} started={self.started} "
+            f"in_flight={self.in_flight}>"
+        )
+
+    @property
+    def started(self) -> bool:
+        """Return whether the worker processes have been started."""
+        return self._executor is not None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The underlying executor, which is created when first accessed."""
+        if self._closed:
+            raise RuntimeError("The process pool has been shut down.")
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_initialize,
+                initargs=(self.preload,),
+            )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Run a function in a worker process and return its result."""
+        if kwargs:
+            func = functools.partial(func, *args, **kwargs)
+            args = ()
+
+        executor = self.executor
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = time.perf_counter()
+
+        try:
+            return await self.loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool as error:
+            self.errors[type(error).__name__] += 1
+            if self._executor is executor:
+                log.warning("A worker process died, replacing the process pool.")
+                self._executor = None
+                executor.shutdown(wait=False)
+            raise
+        except Exception as error:
+            self.errors[type(error).__name__] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.run_times.record(time.perf_counter() - start)
+
+    async def warm(self) -> None:
+        """Start every worker process ahead of time, instead of when work is
+        first submitted.
+        """
+        executor = self.executor
+        try:
+            pids = await asyncio.gather(
+                *(
+                    self.loop.run_in_executor(executor, _warm)
+                    for _ in range(self.workers)
+                )
+            )
+        except Exception:
+            log.exception("Failed to start the worker processes.")
+        else:
+            log.debug("Started %d worker process(es).", len(set(pids)))
+
+    async def shutdown(self, *, timeout: Optional[float] = None) -> None:
+        """Shut down the pool, giving running work up to ``timeout`` seconds to
+        finish before terminating the worker processes.
+        """
+        self._closed = True
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+
+        try:
+            await asyncio.wait_for(
+                self.loop.run_in_executor(None, executor.shutdown), timeout
+            )
+        except asyncio.TimeoutError:
+            # ProcessPoolExecutor can't cancel running work, so the workers are
+            # terminated instead. This also unblocks the shutdown above.
+            processes = list((executor._processes or {}).values())  # type: ignore
+            log.warning(
+                "Terminating %d worker process(es) that didn't finish in time.",
+                len(processes),
+            )
+            for process in processes:
+                process.terminate()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serializable representation of the pool's metrics."""
+        return {
+            "workers": self.workers,
+            "started": self.started,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "errors": dict(self.errors),
+            "run_times": self.run_times.to_dict(),
+        }
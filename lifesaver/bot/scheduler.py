@@ -0,0 +1,673 @@
+# encoding: utf-8
+
+"""Running scheduled jobs from a single task."""
+
+__all__ = ["MODES", "OVERLAP_POLICIES", "MISFIRE_POLICIES", "Job", "Scheduler"]
+
+import asyncio
+import datetime
+import heapq
+import logging
+import math
+import random
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from lifesaver.utils.timing import Histogram, format_seconds
+
+from .cron import CronExpression
+
+log = logging.getLogger(__name__)
+
+#: The ways that the next run of a job can be scheduled. ``delay`` waits for
+#: the interval after each run finishes, and ``rate`` runs the job every
+#: interval regardless of how long each run takes, without drifting. ``cron``
+#: runs the job at the times matched by a cron expression, and is used when one
+#: is passed to :meth:`Scheduler.add`.
+MODES = ("delay", "rate", "cron")
+
+#: What happens when a job in ``rate`` mode falls due while it's still running.
+#: ``skip`` skips the run, and ``allow`` runs it concurrently. Jobs in ``delay``
+#: mode never overlap.
+OVERLAP_POLICIES = ("skip", "allow")
+
+#: What happens when runs are missed, because the event loop was blocked or
+#: the process was suspended. ``run_once`` runs the job once to catch up,
+#: ``run_all`` runs it once for every missed run, one after another, and
+#: ``skip`` skips the missed runs, including any run that would start more than
+#: the misfire grace period late.
+MISFIRE_POLICIES = ("run_once", "run_all", "skip")
+
+# The largest number of missed runs that are counted, after which the schedule
+# skips ahead.
+MAX_MISSED_RUNS = 1000
+
+
+class Job:
+    """A coroutine function that is run periodically by a :class:`Scheduler`."""
+
+    __slots__ = (
+        "name",
+        "callback",
+        "interval",
+        "mode",
+        "jitter",
+        "overlap",
+        "timeout",
+        "cron",
+        "timezone",
+        "align",
+        "offset",
+        "misfire",
+        "misfire_grace",
+        "owner",
+        "log",
+        "base",
+        "next_run",
+        "last_run",
+        "last_duration",
+        "last_lag",
+        "durations",
+        "lags",
+        "runs",
+        "failures",
+        "timeouts",
+        "skipped",
+        "tasks",
+        "removed",
+        "_generation",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        callback: Callable[[], Awaitable[Any]],
+        interval: float,
+        *,
+        mode: str,
+        jitter: float,
+        overlap: str,
+        timeout: Optional[float],
+        cron: Optional[CronExpression] = None,
+        timezone: Optional[datetime.tzinfo] = None,
+        align: bool = False,
+        offset: float = 0.0,
+        misfire: str = "run_once",
+        misfire_grace: float = 1.0,
+        owner: Any,
+        log: logging.Logger,
+    ) -> None:
+        #: The name of the job, like ``"Reminders.check"``.
+        self.name = name
+
+        #: The coroutine function that is run.
+        self.callback = callback
+
+        #: The number of seconds between runs. See :data:`MODES`.
+        self.interval = interval
+
+        #: How the next run is scheduled. See :data:`MODES`.
+        self.mode = mode
+
+        #: The maximum number of seconds that each run is randomly delayed by.
+        self.jitter = jitter
+
+        #: What happens when the job falls due while it's still running. See
+        #: :data:`OVERLAP_POLICIES`.
+        self.overlap = overlap
+
+        #: The number of seconds that each run can take before it is cancelled.
+        self.timeout = timeout
+
+        #: The cron expression that the job runs at, in ``cron`` mode.
+        self.cron = cron
+
+        #: The time zone that :attr:`cron` is evaluated in. ``None`` means UTC.
+        self.timezone = timezone
+
+        #: Whether runs are aligned to the wall clock, in ``rate`` mode. An
+        #: hourly job runs at the top of every hour, for example.
+        self.align = align
+
+        #: The number of seconds that every run is offset by, which spreads out
+        #: jobs that are due at the same time. See ``stagger`` in
+        #: :meth:`Scheduler.add`.
+        self.offset = offset
+
+        #: What happens when runs are missed. See :data:`MISFIRE_POLICIES`.
+        self.misfire = misfire
+
+        #: The number of seconds that a run can start late before it is
+        #: considered missed.
+        self.misfire_grace = misfire_grace
+
+        #: What the job belongs to, like a cog.
+        self.owner = owner
+
+        #: The logger that errors raised by the job are logged to.
+        self.log = log
+
+        #: When the next run is due before jitter, as a loop time. ``None`` if
+        #: the job isn't scheduled (e.g. it's waiting for the bot to be ready,
+        #: or running in ``delay`` mode).
+        self.base: Optional[float] = None
+
+        #: When the next run is due, as a loop time.
+        self.next_run: Optional[float] = None
+
+        #: When the job last started running, as a :func:`time.time` value.
+        self.last_run: Optional[float] = None
+
+        #: How long the last finished run took, in seconds.
+        self.last_duration: Optional[float] = None
+
+        #: How late the last run started, in seconds.
+        self.last_lag: Optional[float] = None
+
+        #: How long each finished run took.
+        self.durations = Histogram()
+
+        #: How late each run started compared to when it was due, which grows
+        #: when the event loop is busy.
+        self.lags = Histogram()
+
+        #: The number of finished runs.
+        self.runs = 0
+
+        #: The number of runs that raised an error, including those that timed
+        #: out.
+        self.failures = 0
+
+        #: The number of runs that were cancelled for taking longer than
+        #: :attr:`timeout`.
+        self.timeouts = 0
+
+        #: The number of runs that were skipped, because the previous run was
+        #: still going or the scheduler fell behind.
+        self.skipped = 0
+
+        #: The tasks of the runs that are currently going.
+        self.tasks: Set[asyncio.Task] = set()
+
+        #: Whether the job has been removed from its scheduler.
+        self.removed = False
+
+        # Incremented whenever the job is rescheduled, so that outdated heap
+        # entries can be told apart.
+        self._generation = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<Job name={self.name!r} interval={self.interval} mode={self.mode!r} "
+            f"running={self.running}>"
+        )
+
+    @property
+    def running(self) -> bool:
+        return bool(self.tasks)
+
+    @property
+    def trigger(self) -> str:
+        """Return a description of when the job runs, like ``1.00s (rate)``."""
+        if self.cron is not None:
+            return f"cron: {self.cron}"
+        mode = f"{self.mode}, aligned" if self.align else self.mode
+        return f"{format_seconds(self.interval)} ({mode})"
+
+    @property
+    def wall_clock(self) -> bool:
+        """Return whether the job is scheduled by the wall clock, rather than
+        relative to its previous run.
+        """
+        return self.cron is not None or self.align
+
+    def next_due(self, after: float) -> float:
+        """Return when the job is next due strictly after a :func:`time.time`
+        value, for jobs scheduled by the wall clock.
+        """
+        if self.cron is not None:
+            timezone = self.timezone or datetime.timezone.utc
+            start = datetime.datetime.fromtimestamp(after - self.offset, timezone)
+            return self.cron.next_after(start).timestamp() + self.offset
+
+        periods = math.floor((after - self.offset) / self.interval) + 1
+        return periods * self.interval + self.offset
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        """Return a JSON serializable representation of the job. ``now`` is the
+        current loop time, which :attr:`next_run` is made relative to.
+        """
+        return {
+            "interval": self.interval,
+            "mode": self.mode,
+            "cron": str(self.cron) if self.cron is not None else None,
+            "align": self.align,
+            "offset": self.offset,
+            "misfire": self.misfire,
+            "jitter": self.jitter,
+            "overlap": self.overlap,
+            "timeout": self.timeout,
+            "running": len(self.tasks),
+            "next_run_in": (
+                max(self.next_run - now, 0.0) if self.next_run is not None else None
+            ),
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_lag": self.last_lag,
+            "durations": self.durations.to_dict(),
+            "lags": self.lags.to_dict(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+        }
+
+
+class Scheduler:
+    """Runs periodic jobs from a single task, using a heap of due times.
+
+    Jobs are added with :meth:`add`, usually through
+    :meth:`lifesaver.commands.Cog.every`. Each run of a job is a separate task,
+    so slow jobs don't hold up the others. Whether a job in ``rate`` mode can
+    run concurrently with itself is up to its overlap policy (see
+    :data:`OVERLAP_POLICIES`).
+
+    Parameters
+    ----------
+    loop
+        The event loop to run jobs on.
+    wait_until_ready
+        A coroutine function that waits until jobs added with
+        ``wait_until_ready`` can be scheduled, like
+        :meth:`discord.Client.wait_until_ready`.
+    """
+
+    def __init__(
+        self,
+        *,
+        loop: asyncio.AbstractEventLoop,
+        wait_until_ready: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> None:
+        self.loop = loop
+        self._wait_until_ready = wait_until_ready
+
+        self._jobs: Dict[str, Job] = {}
+        self._heap: List[Tuple[float, int, int, Job]] = []
+        self._counter = 0
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._unready: List[Tuple[Job, float]] = []
+        self._ready_waiter: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def __repr__(self) -> str:
+        return f"<Scheduler jobs={len(self._jobs)}>"
+
+    @property
+    def jobs(self) -> List[Job]:
+        """Return every job, ordered by when they are next due. Jobs that aren't
+        scheduled come last.
+        """
+        return sorted(
+            self._jobs.values(),
+            key=lambda job: (job.next_run is None, job.next_run or 0, job.name),
+        )
+
+    def get(self, name: str) -> Optional[Job]:
+        """Return a job by name."""
+        return self._jobs.get(name)
+
+    def add(
+        self,
+        name: str,
+        callback: Callable[[], Awaitable[Any]],
+        interval: Optional[float] = None,
+        *,
+        mode: str = "delay",
+        cron: Optional[str] = None,
+        timezone: Optional[datetime.tzinfo] = None,
+        align: bool = False,
+        stagger: float = 0.0,
+        jitter: float = 0.0,
+        overlap: str = "skip",
+        timeout: Optional[float] = None,
+        misfire: str = "run_once",
+        misfire_grace: float = 1.0,
+        initial_delay: float = 0.0,
+        wait_until_ready: bool = False,
+        owner: Any = None,
+        logger: Optional[logging.Logger] = None,
+    ) -> Job:
+        """Add a job, replacing any job with the same name.
+
+        Parameters
+        ----------
+        name
+            The name of the job.
+        callback
+            The coroutine function to run.
+        interval
+            The number of seconds between runs. See :data:`MODES`.
+        mode
+            How the next run is scheduled. See :data:`MODES`.
+        cron
+            A cron expression to run the job at instead of an interval. See
+            :class:`lifesaver.bot.cron.CronExpression`.
+        timezone
+            The time zone to evaluate ``cron`` in. Defaults to UTC.
+        align
+            Align runs in ``rate`` mode to the wall clock, so that they happen
+            at multiples of the interval since the Unix epoch (e.g. at the top
+            of every hour). Aligned jobs don't run right away when added.
+        stagger
+            The maximum number of seconds to offset every run by. The offset is
+            derived from the name of the job, so it stays the same across
+            reloads and restarts while differing between jobs.
+        jitter
+            The maximum number of seconds to randomly delay each run by, which
+            spreads out jobs with the same interval.
+        overlap
+            What happens when the job falls due while it's still running. See
+            :data:`OVERLAP_POLICIES`.
+        timeout
+            The number of seconds that each run can take before it is
+            cancelled. ``None`` lets runs take as long as they need.
+        misfire
+            What happens when runs are missed. See :data:`MISFIRE_POLICIES`.
+        misfire_grace
+            The number of seconds that a run can start late before it is
+            considered missed.
+        initial_delay
+            The number of seconds to wait before the first run, for jobs that
+            aren't scheduled by the wall clock.
+        wait_until_ready
+            Wait until the bot is ready before scheduling the first run.
+        owner
+            What the job belongs to. Jobs can be removed by owner with
+            :meth:`remove_owner`.
+        logger
+            The logger that errors raised by the job are logged to.
+        """
+        if cron is not None:
+            mode = "cron"
+        elif mode == "cron":
+            raise ValueError("The cron mode requires a cron expression.")
+        elif interval is None or interval <= 0:
+            raise ValueError("The interval of a job must be positive.")
+
+        if mode not in MODES:
+            raise ValueError(f"Unknown schedule mode: {mode!r}")
+        if align and mode != "rate":
+            raise ValueError("Only jobs in the rate mode can be aligned.")
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown overlap policy: {overlap!r}")
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"Unknown misfire policy: {misfire!r}")
+
+        existing = self._jobs.get(name)
+        if existing is not None:
+            self.remove(existing)
+
+        job = Job(
+            name,
+            callback,
+            interval,
+            mode=mode,
+            jitter=jitter,
+            overlap=overlap,
+            timeout=timeout,
+            cron=CronExpression(cron) if cron is not None else None,
+            timezone=timezone,
+            align=align,
+            offset=zlib.crc32(name.encode()) / 2 ** 32 * stagger,
+            misfire=misfire,
+            misfire_grace=misfire_grace,
+            owner=owner,
+            log=logger or log,
+        )
+        self._jobs[name] = job
+
+        if wait_until_ready and self._wait_until_ready is not None:
+            self._unready.append((job, initial_delay))
+            if self._ready_waiter is None:
+                self._ready_waiter = self.loop.create_task(self._schedule_when_ready())
+        else:
+            try:
+                self._schedule_first(job, initial_delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.remove(job)
+                raise
+
+        if self._runner is None:
+            self._runner = self.loop.create_task(self._run())
+            self._runner.add_done_callback(self._runner_done)
+
+        return job
+
+    def remove(self, job: Job, *, cancel: bool = True) -> None:
+        """Remove a job, cancelling its running runs unless ``cancel`` is
+        false.
+        """
+        job.removed = True
+        job.next_run = None
+        if self._jobs.get(job.name) is job:
+            del self._jobs[job.name]
+        if cancel:
+            for task in job.tasks:
+                task.cancel()
+
+    def remove_owner(self, owner: Any) -> None:
+        """Remove every job that belongs to an owner."""
+        for job in [job for job in self._jobs.values() if job.owner is owner]:
+            self.remove(job)
+
+    async def stop(
+        self, jobs: Optional[Iterable[Job]] = None, *, timeout: Optional[float] = None
+    ) -> None:
+        """Stop jobs (or every job), without cancelling running ones right away.
+
+        Running jobs are given up to ``timeout`` seconds to finish before being
+        cancelled.
+        """
+        jobs = list(self._jobs.values() if jobs is None else jobs)
+        running = [task for job in jobs for task in job.tasks]
+
+        for job in jobs:
+            self.remove(job, cancel=False)
+
+        if not running:
+            return
+
+        _, pending = await asyncio.wait(running, timeout=timeout)
+        for task in pending:
+            log.warning("Cancelling unfinished scheduled task: %s", task)
+            task.cancel()
+
+    async def close(self, *, timeout: Optional[float] = None) -> None:
+        """Stop every job (see :meth:`stop`), then stop scheduling."""
+        self._closed = True
+        await self.stop(timeout=timeout)
+
+        for task in (self._runner, self._ready_waiter):
+            if task is not None:
+                task.cancel()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serializable representation of every job, keyed by
+        name.
+        """
+        now = self.loop.time()
+        return {job.name: job.to_dict(now) for job in self.jobs}
+
+    def _schedule(self, job: Job, base: float) -> None:
+        if job.removed or self._closed:
+            return
+
+        job.base = base
+        job.next_run = base + (random.uniform(0, job.jitter) if job.jitter else 0)
+        job._generation += 1
+        self._counter += 1
+        heapq.heappush(self._heap, (job.next_run, self._counter, job._generation, job))
+
+        # Wake the runner up if this is now the earliest job.
+        if self._heap[0][3] is job:
+            self._wakeup.set()
+
+    def _loop_time(self, wall: float) -> float:
+        return wall - time.time() + self.loop.time()
+
+    def _wall_time(self, loop_time: float) -> float:
+        return loop_time - self.loop.time() + time.time()
+
+    def _schedule_first(self, job: Job, initial_delay: float) -> None:
+        if job.wall_clock:
+            self._schedule(job, self._loop_time(job.next_due(time.time())))
+        else:
+            self._schedule(job, self.loop.time() + initial_delay + job.offset)
+
+    def _advance(self, job: Job, now: float) -> Tuple[float, int]:
+        """Return when a job in ``rate`` or ``cron`` mode is next due after the
+        run that is due now, and how many runs were missed in between.
+        """
+        missed = 0
+
+        if job.wall_clock:
+            wall_now = self._wall_time(now)
+            # Converting between loop and wall clock times isn't exact, so
+            # search from partway to the next run, to avoid finding this one
+            # again. Cron expressions match at most once a minute.
+            margin = job.interval / 2 if job.cron is None else 30.0
+            due = job.next_due(self._wall_time(job.base) + margin)
+            while due <= wall_now:
+                missed += 1
+                if missed >= MAX_MISSED_RUNS:
+                    due = job.next_due(wall_now)
+                    break
+                due = job.next_due(due)
+            return self._loop_time(due), missed
+
+        # The next run is scheduled from when this one was due, rather than
+        # from now, so that the schedule doesn't drift.
+        base = job.base + job.interval
+        if base <= now:
+            missed = math.floor((now - base) / job.interval) + 1
+            base += missed * job.interval
+        return base, missed
+
+    async def _schedule_when_ready(self) -> None:
+        await self._wait_until_ready()
+
+        unready, self._unready = self._unready, []
+        self._ready_waiter = None
+        for job, initial_delay in unready:
+            try:
+                self._schedule_first(job, initial_delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                job.log.exception("Failed to schedule %s, removing it.", job.name)
+                self.remove(job)
+
+    def _runner_done(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+
+        error = task.exception()
+        if error is not None:
+            log.error(
+                "The scheduler stopped, no more jobs will run.",
+                exc_info=(type(error), error, error.__traceback__),
+            )
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = self.loop.time()
+
+            while self._heap and self._heap[0][0] <= now:
+                _, _, generation, job = heapq.heappop(self._heap)
+                if job.removed or generation != job._generation:
+                    continue
+
+                try:
+                    self._dispatch(job, now)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # Don't let one job stop every other job. Its next run
+                    # can't be trusted, so it's removed.
+                    job.log.exception("Failed to schedule %s, removing it.", job.name)
+                    self.remove(job)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, job: Job, now: float) -> None:
+        late = now - job.next_run
+        job.next_run = None
+
+        missed = 0
+        if job.mode != "delay":
+            base, missed = self._advance(job, now)
+            self._schedule(job, base)
+
+        runs = 1
+        if job.misfire == "run_all":
+            runs += missed
+        else:
+            job.skipped += missed
+
+        if job.misfire == "skip" and late > job.misfire_grace:
+            job.skipped += 1
+            if job.mode == "delay":
+                self._schedule(job, now + job.interval)
+            return
+
+        if job.tasks and job.overlap == "skip" and job.mode != "delay":
+            job.skipped += runs
+            return
+
+        job.last_lag = late
+        job.lags.record(late)
+        job.tasks.add(self.loop.create_task(self._execute(job, runs)))
+
+    async def _execute(self, job: Job, runs: int = 1) -> None:
+        try:
+            for run in range(runs):
+                # Don't catch up on missed runs once the job has been stopped.
+                if run and job.removed:
+                    break
+                await self._execute_once(job)
+        finally:
+            job.tasks.discard(asyncio.current_task())
+
+        if job.mode == "delay":
+            self._schedule(job, self.loop.time() + job.interval)
+
+    async def _execute_once(self, job: Job) -> None:
+        job.last_run = time.time()
+        start = self.loop.time()
+
+        try:
+            await asyncio.wait_for(job.callback(), job.timeout)
+        except asyncio.TimeoutError:
+            job.failures += 1
+            job.timeouts += 1
+            job.log.warning(
+                "Scheduled method %s timed out after %ss.", job.name, job.timeout
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            job.failures += 1
+            job.log.exception("Exception thrown from scheduled method %s", job.name)
+        finally:
+            job.last_duration = self.loop.time() - start
+            job.durations.record(job.last_duration)
+            job.runs += 1
@@ -4,6 +4,7 @@ import asyncio
 import json
 import os
 import uuid
+import weakref
 from abc import ABC, abstractmethod
 from typing import Any, Dict, Type
 
@@ -28,6 +29,10 @@ class AsyncJSONStorage(AsyncStorage):
         https://github.com/Rapptz/RoboDanny/blob/rewrite/cogs/utils/config.py
     """
 
+    # Every storage that has been created, so that they can all be flushed when
+    # the bot shuts down.
+    _instances: "weakref.WeakSet[AsyncJSONStorage]" = weakref.WeakSet()
+
     def __init__(
         self,
         file: str,
@@ -43,9 +48,15 @@ class AsyncJSONStorage(AsyncStorage):
         self.object_hook = object_hook
         self.encoder = encoder
 
+        # Incremented by every change, so that unsaved changes can be detected.
+        self._version = 0
+        self._saved_version = 0
+
         self._load()
+        self._instances.add(self)
 
     def _save(self):
+        version = self._version
         atomic_name = f"{uuid.uuid4()}.tmp"
 
         with open(atomic_name, "w", encoding="utf-8") as fp:
@@ -54,6 +65,7 @@ class AsyncJSONStorage(AsyncStorage):
             )
 
         os.replace(atomic_name, self.file)
+        self._saved_version = version
 
     def _load(self):
         try:
@@ -67,6 +79,19 @@ class AsyncJSONStorage(AsyncStorage):
         async with self.lock:
             await self.loop.run_in_executor(None, self._save)
 
+    async def flush(self):
+        """Wait for any pending save to finish, then save if there are changes
+        that haven't been saved yet.
+        """
+        async with self.lock:
+            if self._version != self._saved_version:
+                await self.loop.run_in_executor(None, self._save)
+
+    @classmethod
+    async def flush_all(cls):
+        """Flush every storage. Called when the bot shuts down."""
+        await asyncio.gather(*(storage.flush() for storage in list(cls._instances)))
+
     async def load(self):
         """Load data from the JSON file on disk."""
         async with self.lock:
@@ -74,10 +99,12 @@ class AsyncJSONStorage(AsyncStorage):
 
     async def put(self, key, value):
         self._data[str(key)] = value
+        self._version += 1
         await self.save()
 
     async def delete(self, key):
         del self._data[str(key)]
+        self._version += 1
         await self.save()
 
     def get(self, key, *args):
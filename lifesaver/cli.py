@@ -1,14 +1,21 @@
 # encoding: utf-8
 
 import asyncio
+import contextlib
 import importlib
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 import click
+import discord
 import ruamel.yaml
 
-from lifesaver.bot import Bot, BotConfig
+from lifesaver.bot import AutoShardedBot, Bot, BotBase, BotConfig
+from lifesaver.cluster import ClusterClient, ClusterSupervisor
 from lifesaver.config import ConfigError
 from lifesaver.logging import setup_logging
+from lifesaver.profiling import StartupProfiler
 
 
 def resolve_class(specifier: str):
@@ -18,31 +25,21 @@ def resolve_class(specifier: str):
     return loaded_class
 
 
-@click.command()
-@click.option("--config", default="config.yml", help="The configuration file to use.")
-@click.option(
-    "--no-default-cogs",
-    is_flag=True,
-    default=False,
-    help="Prevent default cogs from loading.",
-)
-def cli(config, no_default_cogs):
-    try:
-        import uvloop
+def profile(profiler: Optional[StartupProfiler], name: str):
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.span(name)
 
-        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
-    except ImportError:
-        pass
-
-    loop = asyncio.get_event_loop()
 
+def load_config(path: str) -> BotConfig:
+    """Load a bot config, detecting a custom config class to use."""
     try:
-        # Manually load the config first in order to detect a custom config
-        # class to use.
+        # Manually load the config first in order to detect a custom config class
+        # to use.
         #
         # We must do this because the custom config class is specified in the
         # config itself, and we don't know which config class to load yet.
-        with open(config, "r") as fp:
+        with open(path, "r") as fp:
             first_config = ruamel.yaml.YAML().load(fp)
 
         config_class = BotConfig
@@ -51,29 +48,184 @@ def cli(config, no_default_cogs):
         if custom_config_class:
             config_class = resolve_class(custom_config_class)
 
-        config = config_class.load(config)
+        return config_class.load(path)
     except ruamel.yaml.error.YAMLError as error:
         raise ConfigError("Invalid config. Is the syntax correct?") from error
     except FileNotFoundError as error:
-        raise ConfigError(f"No config file was found at {config}.") from error
+        raise ConfigError(f"No config file was found at {path}.") from error
+
+
+def resolve_bot_class(config: BotConfig, *, sharded: bool = False):
+    if not config.bot_class:
+        return AutoShardedBot if sharded else Bot
+
+    bot_class = resolve_class(config.bot_class)
+
+    if sharded and not issubclass(bot_class, AutoShardedBot):
+        raise TypeError(
+            "Custom bot class is not a subclass of lifesaver.bot.AutoShardedBot, "
+            "which is required to run clusters"
+        )
+
+    if not issubclass(bot_class, BotBase):
+        raise TypeError("Custom bot class is not a subclass of lifesaver.bot.BotBase")
+
+    return bot_class
+
+
+def cluster_path(path: str, cluster_id: int) -> str:
+    """Make a per-cluster version of a file path, e.g. ``bot.cluster-0.log``."""
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.cluster-{cluster_id}{path.suffix}"))
+
+
+def boot(
+    config_path: str,
+    *,
+    no_default_cogs: bool = False,
+    profile_startup: bool = False,
+    profile_output: Optional[str] = None,
+    cluster: Optional[ClusterClient] = None,
+    bot_kwargs: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Load the config, then create, prepare, and run the bot."""
+    profiler = None
+    if profile_startup or profile_output:
+        profiler = StartupProfiler(output=profile_output)
+        profiler.install_import_hook()
+
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 
-    bot_class = Bot
+    with profile(profiler, "config"):
+        config = load_config(config_path)
 
-    if config.bot_class:
-        bot_class = resolve_class(config.bot_class)
+    bot_class = resolve_bot_class(config, sharded=cluster is not None)
 
-        if not issubclass(bot_class, Bot):
-            raise TypeError("Custom bot class is not a subclass of lifesaver.bot.Bot")
+    if cluster is not None:
+        # Keep the logs of each cluster apart.
+        config.logging.file = cluster_path(config.logging.file, cluster.cluster_id)
 
     with setup_logging(config.logging):
-        bot = bot_class(config)
+        with profile(profiler, "bot init"):
+            bot = bot_class(config, **(bot_kwargs or {}))
+        bot.profiler = profiler
 
-        if bot.config.postgres and bot.pool is None:
-            loop.run_until_complete(bot._postgres_connect())
+        if cluster is not None:
+            cluster.attach(bot)
+
+        with bot._profile("load_all"):
+            bot.load_all(exclude_default=no_default_cogs)
 
-        bot.load_all(exclude_default=no_default_cogs)
         bot.run()
 
 
+def run_cluster(
+    cluster_id: int,
+    shard_ids: List[int],
+    shard_count: int,
+    connection: Connection,
+    config_path: str,
+    options: Dict[str, Any],
+) -> None:
+    """Run a cluster of shards. This is the target of every cluster process."""
+    if options.get("profile_output"):
+        options["profile_output"] = cluster_path(options["profile_output"], cluster_id)
+
+    boot(
+        config_path,
+        cluster=ClusterClient(connection, cluster_id=cluster_id, shard_ids=shard_ids),
+        bot_kwargs={"shard_ids": shard_ids, "shard_count": shard_count},
+        **options,
+    )
+
+
+async def fetch_recommended_shards(token: str) -> int:
+    """Ask Discord how many shards a bot should use."""
+    http = discord.http.HTTPClient()
+    try:
+        await http.static_login(token, bot=True)
+        shard_count, _ = await http.get_bot_gateway()
+        return shard_count
+    finally:
+        await http.close()
+
+
+def supervise(
+    config_path: str,
+    *,
+    clusters: int,
+    shard_count: Optional[int],
+    options: Dict[str, Any],
+) -> None:
+    """Run the bot's shards across cluster processes until they all exit."""
+    config = load_config(config_path)
+
+    with setup_logging(config.logging):
+        if shard_count is None:
+            shard_count = asyncio.get_event_loop().run_until_complete(
+                fetch_recommended_shards(config.token)
+            )
+
+        supervisor = ClusterSupervisor(
+            run_cluster,
+            shard_count=shard_count,
+            clusters=clusters,
+            args=(config_path, options),
+        )
+        supervisor.run()
+
+
+@click.command()
+@click.option("--config", default="config.yml", help="The configuration file to use.")
+@click.option(
+    "--no-default-cogs",
+    is_flag=True,
+    default=False,
+    help="Prevent default cogs from loading.",
+)
+@click.option(
+    "--profile-startup",
+    is_flag=True,
+    default=False,
+    help="Log a timeline of the bot's startup once it's ready.",
+)
+@click.option(
+    "--profile-output",
+    default=None,
+    help="Export the startup timeline as a JSON trace to this file.",
+)
+@click.option(
+    "--clusters",
+    type=int,
+    default=None,
+    help="Run the bot's shards across this many processes.",
+)
+@click.option(
+    "--shard-count",
+    type=int,
+    default=None,
+    help="The number of shards to use with --clusters. Defaults to Discord's "
+    "recommendation.",
+)
+def cli(
+    config, no_default_cogs, profile_startup, profile_output, clusters, shard_count
+):
+    options = {
+        "no_default_cogs": no_default_cogs,
+        "profile_startup": profile_startup,
+        "profile_output": profile_output,
+    }
+
+    if clusters:
+        supervise(config, clusters=clusters, shard_count=shard_count, options=options)
+    else:
+        boot(config, **options)
+
+
 if __name__ == "__main__":
     cli()
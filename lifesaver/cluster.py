@@ -0,0 +1,426 @@
+# encoding: utf-8
+
+"""Running the shards of a bot across multiple processes."""
+
+__all__ = ["split_shards", "Cluster", "ClusterSupervisor", "ClusterClient"]
+
+import asyncio
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from lifesaver.utils.system import memory_usage
+
+log = logging.getLogger(__name__)
+
+ClusterStats = Dict[str, Any]
+
+
+def split_shards(shard_count: int, clusters: int) -> List[List[int]]:
+    """Split the shard IDs of a bot into contiguous, evenly sized groups.
+
+    Fewer groups are returned if there are fewer shards than clusters.
+    """
+    if shard_count < 1 or clusters < 1:
+        raise ValueError("The shard and cluster counts must be positive.")
+
+    clusters = min(clusters, shard_count)
+    size, remainder = divmod(shard_count, clusters)
+
+    groups = []
+    start = 0
+    for index in range(clusters):
+        end = start + size + (1 if index < remainder else 0)
+        groups.append(list(range(start, end)))
+        start = end
+
+    return groups
+
+
+class Cluster:
+    """A worker process running a group of shards, as seen by the supervisor."""
+
+    def __init__(self, id: int, shard_ids: List[int]) -> None:
+        #: The ID of the cluster.
+        self.id = id
+
+        #: The IDs of the shards that the cluster runs.
+        self.shard_ids = shard_ids
+
+        #: The worker process, if it is running.
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+
+        #: The supervisor's end of the pipe to the worker.
+        self.connection: Optional[Connection] = None
+
+        #: When the worker was last started, as a :func:`time.monotonic` value.
+        self.started_at = 0.0
+
+        #: The number of times the worker has been restarted since it was last
+        #: stable.
+        self.restarts = 0
+
+        #: The latest stats reported by the worker.
+        self.stats: ClusterStats = {}
+
+    def __repr__(self) -> str:
+        return f"<Cluster id={self.id} shard_ids={self.shard_ids!r} alive={self.alive}>"
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if self.connection is None:
+            return
+        try:
+            self.connection.send(message)
+        except (OSError, ValueError):
+            # The worker is exiting; its sentinel will say so shortly.
+            pass
+
+
+class ClusterSupervisor:
+    """Runs the shards of a bot in clusters of worker processes, restarting the
+    workers that crash.
+
+    Each worker runs ``target(cluster_id, shard_ids, shard_count, connection,
+    *args)``, where ``connection`` is the worker's end of a pipe to the
+    supervisor (see :class:`ClusterClient`). Workers are started with the
+    ``spawn`` method, so ``target`` and ``args`` must be picklable.
+
+    Workers that exit with a non-zero code are restarted after a delay that
+    doubles with every consecutive crash. Workers that exit cleanly are not.
+
+    Parameters
+    ----------
+    target
+        The function that runs a cluster.
+    shard_count
+        The total number of shards.
+    clusters
+        The number of worker processes to split the shards across.
+    args
+        Extra arguments to pass to ``target``.
+    restart_delay
+        The number of seconds to wait before restarting a crashed worker.
+    max_restart_delay
+        The longest that a restart can be delayed.
+    stable_after
+        The number of seconds after which a running worker is considered
+        stable, resetting its restart delay.
+    """
+
+    def __init__(
+        self,
+        target: Callable[..., None],
+        *,
+        shard_count: int,
+        clusters: int,
+        args: Sequence[Any] = (),
+        restart_delay: float = 5.0,
+        max_restart_delay: float = 300.0,
+        stable_after: float = 60.0,
+    ) -> None:
+        self.target = target
+        self.shard_count = shard_count
+        self.args = tuple(args)
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_after = stable_after
+
+        #: The clusters being supervised.
+        self.clusters = [
+            Cluster(id, shard_ids)
+            for (id, shard_ids) in enumerate(split_shards(shard_count, clusters))
+        ]
+
+        self._context = multiprocessing.get_context("spawn")
+        self._restarts: Dict[int, float] = {}
+        self._stopping = False
+
+    def __repr__(self) -> str:
+        return (
+            f"<ClusterSupervisor shard_count={self.shard_count} "
+            f"clusters={len(self.clusters)}>"
+        )
+
+    def stats(self) -> Dict[int, ClusterStats]:
+        """Return the latest stats of every cluster, keyed by cluster ID."""
+        return {
+            cluster.id: {
+                "shard_ids": cluster.shard_ids,
+                "alive": cluster.alive,
+                "restarts": cluster.restarts,
+                **cluster.stats,
+            }
+            for cluster in self.clusters
+        }
+
+    def _start(self, cluster: Cluster) -> None:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=self.target,
+            args=(cluster.id, cluster.shard_ids, self.shard_count, child, *self.args),
+            name=f"cluster-{cluster.id}",
+        )
+        process.start()
+        # Only the worker should hold its end, so that the pipe breaks if it dies.
+        child.close()
+
+        cluster.process = process
+        cluster.connection = parent
+        cluster.started_at = time.monotonic()
+        cluster.stats = {}
+        log.info(
+            "Started cluster %d (shards %s) as process %d.",
+            cluster.id,
+            cluster.shard_ids,
+            process.pid,
+        )
+
+    def _handle_exit(self, cluster: Cluster) -> None:
+        process = cluster.process
+        process.join()
+        cluster.process = None
+        cluster.connection.close()
+        cluster.connection = None
+
+        if self._stopping:
+            return
+
+        if process.exitcode == 0:
+            log.info("Cluster %d exited cleanly, not restarting it.", cluster.id)
+            return
+
+        if time.monotonic() - cluster.started_at >= self.stable_after:
+            cluster.restarts = 0
+
+        delay = min(self.restart_delay * 2 ** cluster.restarts, self.max_restart_delay)
+        cluster.restarts += 1
+        self._restarts[cluster.id] = time.monotonic() + delay
+        log.warning(
+            "Cluster %d exited with code %s, restarting it in %.1fs.",
+            cluster.id,
+            process.exitcode,
+            delay,
+        )
+
+    def _handle_message(self, cluster: Cluster) -> None:
+        try:
+            message = cluster.connection.recv()
+        except (EOFError, OSError):
+            return
+
+        op = message.get("op")
+        if op == "stats":
+            cluster.stats = message["stats"]
+        elif op == "broadcast":
+            forwarded = {
+                "op": "broadcast",
+                "cluster": cluster.id,
+                "payload": message["payload"],
+            }
+            for other in self.clusters:
+                other.send(forwarded)
+        elif op == "query":
+            cluster.send(
+                {"op": "reply", "nonce": message["nonce"], "clusters": self.stats()}
+            )
+        else:
+            log.warning("Unknown message from cluster %d: %r", cluster.id, message)
+
+    def stop(self) -> None:
+        """Stop supervising, shutting down every worker."""
+        self._stopping = True
+
+    def run(self) -> None:
+        """Start every worker and supervise them until they have all exited
+        cleanly, or until :meth:`stop` is called (``SIGTERM`` also does so).
+        """
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: self.stop())
+
+        try:
+            for cluster in self.clusters:
+                self._start(cluster)
+            self._supervise()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            self._shutdown()
+
+    def _supervise(self) -> None:
+        while not self._stopping:
+            now = time.monotonic()
+            for cluster in self.clusters:
+                restart_at = self._restarts.get(cluster.id)
+                if restart_at is not None and restart_at <= now:
+                    del self._restarts[cluster.id]
+                    self._start(cluster)
+
+            running = [cluster for cluster in self.clusters if cluster.process]
+            if not running and not self._restarts:
+                log.info("Every cluster has exited.")
+                return
+
+            connections = {cluster.connection: cluster for cluster in running}
+            sentinels = {cluster.process.sentinel: cluster for cluster in running}
+
+            timeout = 1.0
+            if self._restarts:
+                timeout = min(timeout, max(min(self._restarts.values()) - now, 0))
+
+            ready = wait([*connections, *sentinels], timeout)
+
+            # Read any last messages before handling exits, which close the pipes.
+            for obj in ready:
+                if obj in connections:
+                    self._handle_message(connections[obj])
+            for obj in ready:
+                if obj in sentinels:
+                    self._handle_exit(sentinels[obj])
+
+    def _shutdown(self, *, timeout: float = 30.0) -> None:
+        self._stopping = True
+        running = [cluster for cluster in self.clusters if cluster.process]
+
+        for cluster in running:
+            if cluster.process.is_alive():
+                cluster.process.terminate()
+
+        deadline = time.monotonic() + timeout
+        for cluster in running:
+            cluster.process.join(max(deadline - time.monotonic(), 0))
+            if cluster.process.is_alive():
+                log.warning(
+                    "Cluster %d didn't shut down in time, killing it.", cluster.id
+                )
+                cluster.process.kill()
+                cluster.process.join()
+            cluster.connection.close()
+            cluster.process = None
+            cluster.connection = None
+
+
+class ClusterClient:
+    """A worker's end of the pipe to the :class:`ClusterSupervisor`.
+
+    Once attached to a bot, it periodically reports the bot's stats to the
+    supervisor, and dispatches broadcasts from other clusters as the
+    ``cluster_broadcast`` event, with the payload and the ID of the cluster that
+    sent it::
+
+        @lifesaver.Cog.listener()
+        async def on_cluster_broadcast(self, payload, cluster_id):
+            ...
+    """
+
+    def __init__(
+        self,
+        connection: Connection,
+        *,
+        cluster_id: int,
+        shard_ids: List[int],
+        stats_interval: float = 15.0,
+    ) -> None:
+        #: The ID of this cluster.
+        self.cluster_id = cluster_id
+
+        #: The IDs of the shards that this cluster runs.
+        self.shard_ids = shard_ids
+
+        #: The number of seconds between reports of this cluster's stats.
+        self.stats_interval = stats_interval
+
+        self.bot = None
+        self._connection = connection
+        self._nonce = 0
+        self._replies: Dict[int, asyncio.Future] = {}
+        self._reader: Optional[threading.Thread] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"<ClusterClient cluster_id={self.cluster_id} "
+            f"shard_ids={self.shard_ids!r}>"
+        )
+
+    def attach(self, bot) -> None:
+        """Attach to a bot, setting its ``cluster`` attribute."""
+        self.bot = bot
+        bot.cluster = self
+
+        # Connection.recv blocks, so it's called from a thread.
+        self._reader = threading.Thread(
+            target=self._read, name=f"cluster-{self.cluster_id}-ipc", daemon=True
+        )
+        self._reader.start()
+        bot.loop.create_task(self._report_stats())
+
+    def _read(self) -> None:
+        while True:
+            try:
+                message = self._connection.recv()
+            except (EOFError, OSError):
+                log.warning("The connection to the cluster supervisor was lost.")
+                return
+            self.bot.loop.call_soon_threadsafe(self._handle, message)
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        op = message.get("op")
+        if op == "broadcast":
+            self.bot.dispatch(
+                "cluster_broadcast", message["payload"], message["cluster"]
+            )
+        elif op == "reply":
+            future = self._replies.pop(message["nonce"], None)
+            if future is not None and not future.done():
+                future.set_result(message["clusters"])
+
+    def send(self, message: Dict[str, Any]) -> None:
+        """Send a message to the supervisor."""
+        try:
+            self._connection.send(message)
+        except (OSError, ValueError):
+            log.warning(
+                "Failed to send %r to the cluster supervisor.", message.get("op")
+            )
+
+    def broadcast(self, payload: Any) -> None:
+        """Dispatch ``cluster_broadcast`` with a picklable payload in every
+        cluster, including this one.
+        """
+        self.send({"op": "broadcast", "payload": payload})
+
+    async def fetch_stats(self, *, timeout: float = 5.0) -> Dict[int, ClusterStats]:
+        """Return the latest stats of every cluster, keyed by cluster ID."""
+        self._nonce += 1
+        nonce = self._nonce
+        future = self.bot.loop.create_future()
+        self._replies[nonce] = future
+        self.send({"op": "query", "nonce": nonce})
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._replies.pop(nonce, None)
+
+    def stats(self) -> ClusterStats:
+        """Return the stats of this cluster."""
+        bot = self.bot
+        return {
+            "ready": bot.is_ready(),
+            "guilds": len(bot.guilds),
+            "users": len(bot.users),
+            "latency": bot.latency,
+            "memory": memory_usage(),
+        }
+
+    async def _report_stats(self) -> None:
+        while not self.bot.is_closed():
+            self.send({"op": "stats", "stats": self.stats()})
+            await asyncio.sleep(self.stats_interval)
@@ -3,12 +3,14 @@
 __all__ = ["Cog"]
 
 import asyncio
+import datetime
+import functools
 import inspect
 import logging
 import os
 from typing import (
     Callable,
-    Awaitable,
+    Dict,
     List,
     Any,
     Optional,
@@ -21,6 +23,8 @@ import aiohttp
 from discord.ext import commands
 
 import lifesaver
+from lifesaver.bot.cron import CronExpression
+from lifesaver.bot.scheduler import MISFIRE_POLICIES, MODES, OVERLAP_POLICIES, Job
 from lifesaver.config import Config
 
 F = TypeVar("F", bound=Callable[..., Any])
@@ -53,19 +57,20 @@ class Cog(C):
         #: The logger for this cog. The name of the logger is derived from :attr:`name`.
         self.log: logging.Logger = logging.getLogger(f"cog.{self.name}")
 
-        #: The :class:`aiohttp.ClientSession` for this cog.
-        self.session = aiohttp.ClientSession(loop=self.loop)
+        #: The :class:`aiohttp.ClientSession` for this cog. It shares the bot's
+        #: connection pool (see :meth:`lifesaver.bot.BotBase.create_session`).
+        self.session: aiohttp.ClientSession = bot.create_session()
 
         #: The loaded config file. Only present when :meth:`with_config` is used.
         self.config: Optional[lifesaver.config.Config] = None
 
-        if hasattr(self, "__lifesaver_config_cls__"):
-            config_cls = self.__lifesaver_config_cls__
-            if config_cls is not None:
-                path = os.path.join(self.bot.config.cog_config_path, self.name + ".yml")
-                self.config = config_cls.load(path)
+        config_cls = getattr(self, "__lifesaver_config_cls__", None)
+        if config_cls is not None:
+            # Parsed config files are cached, so this only parses the file if
+            # it has changed since it was last loaded.
+            self.config = config_cls.load(self.config_path)
 
-        self._scheduled_tasks: List[asyncio.Task[Any]] = []
+        self._scheduled_jobs: List[Job] = []
         self._setup_schedules()
 
     @property
@@ -73,6 +78,23 @@ class Cog(C):
         """A shortcut to the :class:`asyncio.AbstractEventLoop` that the bot is running on."""
         return self.bot.loop
 
+    @property
+    def config_path(self) -> str:
+        """The path of the config file loaded when :meth:`with_config` is used."""
+        return os.path.join(self.bot.config.cog_config_path, self.name + ".yml")
+
+    async def reload_config(self) -> None:
+        """Load :attr:`config` again, without blocking the event loop.
+
+        The file is parsed in an executor, and only if it has changed since it
+        was last loaded. See :meth:`lifesaver.config.Config.load_async`.
+        """
+        config_cls = getattr(self, "__lifesaver_config_cls__", None)
+        if config_cls is None:
+            raise TypeError(f"{self.qualified_name} doesn't use Cog.with_config.")
+
+        self.config = await config_cls.load_async(self.config_path, loop=self.loop)
+
     @property
     def pool(self):
         """A shortcut to :attr:`lifesaver.bot.BotBase.pool`."""
@@ -84,6 +106,10 @@ class Cog(C):
 
         The config file is loaded according to :attr:`lifesaver.bot.BotConfig.cog_config_path`
         and :attr:`name` when constructed. The parsed config resides in :attr:`config`.
+
+        Parsed config files are cached until they change, so constructing the
+        cog again (e.g. when its extension is reloaded) doesn't parse the file
+        again. Use :meth:`reload_config` to reload the config while running.
         """
 
         def decorator(cls: Type["Cog"]) -> Type["Cog"]:
@@ -92,31 +118,27 @@ class Cog(C):
 
         return decorator
 
-    def _schedule_method(
-        self, name: str, method: Callable[..., Awaitable[None]]
-    ) -> None:
-        schedule = method.__lifesaver_schedule__  # type: ignore
-
-        async def scheduled_function_wrapper() -> None:
-            if "wait_until_ready" in schedule:
-                await self.bot.wait_until_ready()
-
-            while True:
-                if "initial_sleep" in schedule:
-                    await asyncio.sleep(schedule["interval"])
+    def _schedule_method(self, name: str, method: Callable[..., Any]) -> None:
+        options = dict(method.__lifesaver_schedule__)  # type: ignore
+        initial_sleep = options.pop("initial_sleep", False)
 
-                try:
-                    await method()
-                except Exception:
-                    self.log.exception(f"Exception thrown from scheduled method {name}")
+        callback = method
+        if options.pop("process", False):
+            callback = functools.partial(self.bot.run_cpu, method)
 
-                await asyncio.sleep(schedule["interval"])
-
-        task = self.bot.loop.create_task(scheduled_function_wrapper())
-        self._scheduled_tasks.append(task)
+        job = self.bot.scheduler.add(
+            f"{self.qualified_name}.{name}",
+            callback,
+            initial_delay=options["interval"] if initial_sleep else 0,
+            owner=self,
+            logger=self.log,
+            **options,
+        )
+        self._scheduled_jobs.append(job)
 
     def _setup_schedules(self) -> None:
-        methods = inspect.getmembers(self, predicate=inspect.ismethod)
+        # Methods run in a process are static methods, which aren't bound.
+        methods = inspect.getmembers(self, predicate=inspect.isroutine)
 
         for (name, method) in methods:
             if not hasattr(method, "__lifesaver_schedule__"):
@@ -127,27 +149,85 @@ class Cog(C):
     def cog_unload(self) -> None:
         """The special method called upon this cog being unloaded.
 
-        It cancels scheduled tasks created through :meth:`every`, and destroys
-        :attr:`session`.
+        It removes the jobs scheduled through :meth:`every` (cancelling the
+        running ones), and destroys :attr:`session`.
 
         If you override this, make sure to call ``super().cog_unload()``.
         """
-        for scheduled_task in self._scheduled_tasks:
-            self.log.debug("Cancelling scheduled task: %s", scheduled_task)
-            scheduled_task.cancel()
+        for job in self._scheduled_jobs:
+            self.log.debug("Removing scheduled job: %s", job)
+            self.bot.scheduler.remove(job)
+
+        if not self.session.closed:
+            self.loop.create_task(self.session.close())
+
+    async def stop_schedules(self, *, timeout: Optional[float] = None) -> None:
+        """Stop the jobs scheduled through :meth:`every`.
+
+        Jobs that are waiting for their next run are removed right away, while
+        jobs that are currently running are given up to ``timeout`` seconds to
+        finish before being cancelled. See
+        :meth:`lifesaver.bot.scheduler.Scheduler.stop`.
+        """
+        await self.bot.scheduler.stop(self._scheduled_jobs, timeout=timeout)
+
+    @staticmethod
+    def _scheduled(decorator: str, options: Dict[str, Any]) -> Callable[[F], F]:
+        if options["mode"] not in MODES:
+            raise ValueError(f"Unknown schedule mode: {options['mode']!r}")
+        if options.get("align") and options["mode"] != "rate":
+            raise ValueError("Only methods in the rate mode can be aligned.")
+        if options["overlap"] not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown overlap policy: {options['overlap']!r}")
+        if options["misfire"] not in MISFIRE_POLICIES:
+            raise ValueError(f"Unknown misfire policy: {options['misfire']!r}")
+        if options.get("cron") is not None:
+            # Raises ValueError if the expression is invalid.
+            CronExpression(options["cron"])
+
+        def outer(func: F) -> F:
+            if options["process"]:
+                if not isinstance(func, staticmethod):
+                    raise TypeError(
+                        f"You must use Cog.{decorator} with process=True on a "
+                        "static method."
+                    )
+                function = func.__func__
+                if inspect.iscoroutinefunction(function):
+                    raise TypeError("Methods run in a process can't be coroutines.")
+            else:
+                function = func
+                if not inspect.iscoroutinefunction(function):
+                    raise TypeError(f"You must use Cog.{decorator} on a coroutine.")
+
+            function.__lifesaver_schedule__ = options  # type: ignore
+            return func
 
-        self.loop.create_task(self.session.close())
+        return outer
 
     @classmethod
     def every(
         cls,
-        interval: int,
+        interval: float,
         *,
         wait_until_ready: bool = False,
         initial_sleep: bool = False,
+        mode: str = "delay",
+        align: bool = False,
+        stagger: float = 0.0,
+        jitter: float = 0.0,
+        overlap: str = "skip",
+        timeout: Optional[float] = None,
+        misfire: str = "run_once",
+        misfire_grace: float = 1.0,
+        process: bool = False,
     ) -> Callable[[F], F]:
         """A decorator that designates this function to be executed every ``n`` second(s).
 
+        Scheduled methods are run by the bot's
+        :class:`lifesaver.bot.scheduler.Scheduler`, as a job named after the
+        cog and the method (e.g. ``Reminders.check``).
+
         Parameters
         ----------
         interval
@@ -155,19 +235,114 @@ class Cog(C):
         wait_until_ready
             Waits until the bot is ready before running.
         initial_sleep
-            The number of seconds to sleep before running.
+            Waits for the interval before running for the first time.
+        mode
+            ``delay`` waits for the interval after each run finishes, while
+            ``rate`` runs the method every interval regardless of how long each
+            run takes, without drifting. See
+            :data:`lifesaver.bot.scheduler.MODES`.
+        align
+            Aligns runs to the wall clock (e.g. an hourly method runs at the top
+            of every hour) instead of to when the cog was loaded. Requires the
+            ``rate`` mode.
+        stagger
+            The maximum number of seconds to offset every run by, derived from
+            the name of the method. Unlike ``jitter``, the offset stays the same
+            across reloads, so methods with the same interval stay spread out.
+        jitter
+            The maximum number of seconds to randomly delay each run by.
+        overlap
+            ``skip`` skips runs that fall due while the previous run is still
+            going, while ``allow`` lets them run concurrently. Only applies to
+            the ``rate`` mode. See
+            :data:`lifesaver.bot.scheduler.OVERLAP_POLICIES`.
+        timeout
+            The number of seconds that each run can take before it is
+            cancelled.
+        misfire
+            What happens when runs are missed because the bot was too busy.
+            See :data:`lifesaver.bot.scheduler.MISFIRE_POLICIES`.
+        misfire_grace
+            The number of seconds that a run can start late before it is
+            considered missed.
+        process
+            Runs the method in a worker process with
+            :meth:`lifesaver.bot.BotBase.run_cpu`, for CPU-bound work that would
+            otherwise block the event loop. The method must be a regular
+            function wrapped in :func:`staticmethod` (below this decorator),
+            since it's pickled and can't take the cog. A timeout stops waiting
+            for the run, but doesn't stop the worker process.
+
+        Example
+        -------
+
+        .. code:: python3
+
+            @lifesaver.Cog.every(3600, process=True)
+            @staticmethod
+            def rebuild_index():
+                ...
         """
-
-        def outer(func: F) -> F:
-            if not inspect.iscoroutinefunction(func):
-                raise TypeError("You must use Cog.every on a coroutine.")
-
-            func.__lifesaver_schedule__ = {  # type: ignore
+        return cls._scheduled(
+            "every",
+            {
                 "interval": interval,
                 "wait_until_ready": wait_until_ready,
                 "initial_sleep": initial_sleep,
-            }
+                "mode": mode,
+                "align": align,
+                "stagger": stagger,
+                "jitter": jitter,
+                "overlap": overlap,
+                "timeout": timeout,
+                "misfire": misfire,
+                "misfire_grace": misfire_grace,
+                "process": process,
+            },
+        )
 
-            return func
+    @classmethod
+    def cron(
+        cls,
+        expression: str,
+        *,
+        timezone: Optional[datetime.tzinfo] = None,
+        wait_until_ready: bool = False,
+        stagger: float = 0.0,
+        jitter: float = 0.0,
+        overlap: str = "skip",
+        timeout: Optional[float] = None,
+        misfire: str = "run_once",
+        misfire_grace: float = 1.0,
+        process: bool = False,
+    ) -> Callable[[F], F]:
+        """A decorator that designates this function to be executed at the times
+        matched by a cron expression, like ``0 * * * *`` for the top of every
+        hour. See :class:`lifesaver.bot.cron.CronExpression`.
 
-        return outer
+        Parameters
+        ----------
+        expression
+            The cron expression.
+        timezone
+            The time zone to evaluate the expression in. Defaults to UTC.
+
+        The other parameters are the same as those of :meth:`every`.
+        """
+        return cls._scheduled(
+            "cron",
+            {
+                "interval": None,
+                "mode": "cron",
+                "cron": expression,
+                "timezone": timezone,
+                "wait_until_ready": wait_until_ready,
+                "stagger": stagger,
+                "jitter": jitter,
+                "overlap": overlap,
+                "timeout": timeout,
+                "misfire": misfire,
+                "misfire_grace": misfire_grace,
+                "process": process,
+            },
+        )
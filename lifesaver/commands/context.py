@@ -2,7 +2,7 @@
 
 __all__ = ["Context"]
 
-from typing import Any, Callable, List, Optional, Type, TypeVar, Union
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union
 
 import discord
 import jishaku
@@ -27,6 +27,13 @@ class Context(commands.Context):
         #: (see :meth:`paginate`).
         self.paginator = commands.Paginator(prefix="", suffix="", max_size=1900)
 
+        #: The time (in seconds) spent in each phase of the invocation so far,
+        #: keyed by phase. See :class:`lifesaver.bot.metrics.CommandMetrics`.
+        self.timings: Dict[str, float] = {}
+
+        #: The error that the invoked command failed with, if any.
+        self.error: Optional[commands.CommandError] = None
+
     def emoji(self, *args, **kwargs) -> Union[str, discord.Emoji]:
         """A shortcut to :meth:`lifesaver.bot.BotBase.emoji`."""
         return self.bot.emoji(*args, **kwargs)
@@ -2,9 +2,17 @@
 
 __all__ = ["SubcommandInvocationRequired", "Command", "Group", "command", "group"]
 
+import time
+
 from discord.ext import commands
 
 
+def _add_timing(ctx, phase: str, start: float) -> None:
+    timings = getattr(ctx, "timings", None)
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
 class SubcommandInvocationRequired(commands.CommandError):
     """A :class:`discord.ext.commands.CommandError` that is subclass raised when a subcommand needs to be invoked."""
 
@@ -25,6 +33,30 @@ class Command(commands.Command):
         else:
             await super().invoke(ctx)
 
+    async def can_run(self, ctx):
+        # Checks are also run outside of invocations (e.g. by the help command),
+        # which shouldn't be timed.
+        if ctx.command is not self:
+            return await super().can_run(ctx)
+
+        start = time.perf_counter()
+        try:
+            return await super().can_run(ctx)
+        finally:
+            _add_timing(ctx, "checks", start)
+
+    async def _parse_arguments(self, ctx):
+        start = time.perf_counter()
+        try:
+            await super()._parse_arguments(ctx)
+        finally:
+            _add_timing(ctx, "parse", start)
+
+    async def dispatch_error(self, ctx, error):
+        if hasattr(ctx, "error"):
+            ctx.error = error
+        await super().dispatch_error(ctx, error)
+
 
 class Group(commands.Group, Command):
     """A :class:`discord.ext.commands.Group` subclass that implements additional features."""
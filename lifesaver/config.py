@@ -1,7 +1,10 @@
 # encoding: utf-8
 
+import asyncio
 import collections
+import copy
 import inspect
+import os
 import typing
 
 from ruamel.yaml import YAML
@@ -14,11 +17,53 @@ class ConfigError(LifesaverError):
     """An error thrown by the Config loader."""
 
 
+# The parsed contents of config files, keyed by path, along with the
+# modification time and size of the file when it was parsed.
+_cache: typing.Dict[str, typing.Tuple[typing.Tuple[int, int], typing.Any]] = {}
+
+
+# A field of a config class: its name, its default value, its class if it's a
+# nested config, and whether provided dicts are merged onto the default.
+_Field = typing.Tuple[str, typing.Any, typing.Optional[type], bool]
+
+
+def _stat(path: str) -> typing.Tuple[int, int]:
+    result = os.stat(path)
+    return (result.st_mtime_ns, result.st_size)
+
+
+def _parse(path: str) -> typing.Any:
+    with open(path, "r") as fp:
+        return YAML().load(fp.read())
+
+
+def _cached(path: str) -> typing.Tuple[str, typing.Tuple[int, int], typing.Any]:
+    # Return the cache key and file stats of a path, and the cached data if
+    # the file hasn't changed since it was parsed (or None).
+    key = os.path.abspath(path)
+    stat = _stat(key)
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == stat:
+        return key, stat, entry[1]
+    return key, stat, None
+
+
+def clear_cache() -> None:
+    """Forget every parsed config file, so that they are parsed again when next
+    loaded.
+    """
+    _cache.clear()
+
+
 class Config:
     """A dict-like object that encompasses a configuration of some kind.
 
     All config files use YAML_ for markup.
 
+    The fields of a config class (their type hints and defaults) are resolved
+    when the class is first instantiated, so changes to the class's attributes
+    after that aren't picked up.
+
     .. _YAML: https://en.wikipedia.org/wiki/YAML
     """
 
@@ -32,38 +77,93 @@ class Config:
         """
         self._load_data(data)
 
-    def _load_data(self, data):
-        # Grab the type hints as defined in the class.
-        # (Can't do it on the instance, or else it doesn't traverse the MRO.)
-        hints = typing.get_type_hints(self.__class__)
+    @classmethod
+    def _schema(cls) -> typing.Tuple[_Field, ...]:
+        # The fields of the class, resolved once per class and kept in the
+        # class's own __dict__, since subclasses have fields of their own.
+        schema = cls.__dict__.get("__lifesaver_schema__")
+        if schema is not None:
+            return schema
 
-        for name, hint in hints.items():
-            # The default value is already set (it's the class attribute!)
-            default_value = getattr(self, name, None)
-            value = data.get(name, default_value)
+        fields = []
 
+        # Grab the type hints as defined in the class.
+        # (Can't do it on an instance, or else it doesn't traverse the MRO.)
+        for name, hint in typing.get_type_hints(cls).items():
+            # The default value is the class attribute, if any.
+            default = getattr(cls, name, None)
+            nested = None
             if inspect.isclass(hint) and issubclass(hint, Config):
+                nested = hint
+            merge = isinstance(default, collections.abc.Mapping)
+            fields.append((name, default, nested, merge))
+
+        schema = tuple(fields)
+        setattr(cls, "__lifesaver_schema__", schema)
+        return schema
+
+    def _load_data(self, data):
+        for name, default, nested, merge in self._schema():
+            value = data.get(name, default)
+
+            if nested is not None:
                 # Load a nested config using the provided inner mapping, or fall
                 # back to an empty dict to use the nested config's defaults.
-                value = hint(value or {})
-
-            if isinstance(default_value, collections.abc.Mapping) and isinstance(
-                value, dict
-            ):
-                # Merge the provided dict into the default mapping instead of overwriting.
-                value = merge_dicts(default_value, value)
+                value = nested(value or {})
+            elif merge and value is not default and isinstance(value, dict):
+                # Merge the provided dict into a copy of the default mapping
+                # instead of overwriting it. The default itself is shared by
+                # every instance, so it's left untouched.
+                value = merge_dicts(copy.deepcopy(default), value)
 
             setattr(self, name, value)
 
     @classmethod
-    def load(cls, path: str) -> "Config":
+    def load(cls, path: str, *, cache: bool = True) -> "Config":
         """Creates a Config instance from a file path.
 
+        The parsed file is cached, keyed by its path, modification time, and
+        size, so loading a file that hasn't changed (e.g. when reloading an
+        extension) doesn't parse it again. Every call returns a new instance.
+
         Parameters
         ----------
         path
             A path to a YAML_ file.
+        cache
+            Whether to use and update the cache.
         """
-        with open(path, "r") as fp:
-            yaml = fp.read()
-            return cls(YAML().load(yaml))
+        if not cache:
+            return cls(_parse(path))
+
+        key, stat, data = _cached(path)
+        if data is None:
+            data = _parse(path)
+            _cache[key] = (stat, data)
+
+        # The cached data is copied so that it can't be mutated through the
+        # instance.
+        return cls(copy.deepcopy(data))
+
+    @classmethod
+    async def load_async(
+        cls,
+        path: str,
+        *,
+        cache: bool = True,
+        loop: typing.Optional[asyncio.AbstractEventLoop] = None,
+    ) -> "Config":
+        """Like :meth:`load`, but parses the file in an executor instead of
+        blocking the event loop. Files that are cached aren't parsed at all.
+        """
+        loop = loop or asyncio.get_event_loop()
+
+        if not cache:
+            return cls(await loop.run_in_executor(None, _parse, path))
+
+        key, stat, data = _cached(path)
+        if data is None:
+            data = await loop.run_in_executor(None, _parse, path)
+            _cache[key] = (stat, data)
+
+        return cls(copy.deepcopy(data))
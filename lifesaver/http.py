@@ -0,0 +1,562 @@
+# encoding: utf-8
+
+"""Caching of outbound HTTP responses."""
+
+__all__ = ["CACHEABLE_STATUSES", "CachedResponse", "CachedSession"]
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from http.client import responses
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+#: The response statuses that may be cached.
+CACHEABLE_STATUSES = frozenset({200, 203, 300, 301, 308, 404, 410})
+
+
+def _directives(header: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parse a ``Cache-Control`` header into a dict of directives."""
+    directives: Dict[str, Optional[str]] = {}
+    if not header:
+        return directives
+
+    for directive in header.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+
+    return directives
+
+
+def _parse_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _lifetime(headers: Mapping[str, str], default_ttl: float) -> float:
+    """Return the number of seconds that a response is fresh for, as of when it
+    was received.
+    """
+    directives = _directives(headers.get("Cache-Control"))
+
+    if "no-cache" in directives:
+        lifetime = 0.0
+    elif directives.get("max-age") is not None:
+        try:
+            lifetime = float(directives["max-age"])
+        except ValueError:
+            lifetime = 0.0
+    elif "Expires" in headers:
+        expires = _parse_date(headers["Expires"])
+        date = _parse_date(headers.get("Date")) or time.time()
+        # Invalid dates (like "0") mean that the response has already expired.
+        lifetime = expires - date if expires is not None else 0.0
+    else:
+        lifetime = default_ttl
+
+    try:
+        age = float(headers.get("Age", 0))
+    except ValueError:
+        age = 0.0
+
+    return max(lifetime - age, 0.0)
+
+
+class CachedResponse:
+    """A response that was read in full, and possibly served from a cache.
+
+    It mirrors the parts of :class:`aiohttp.ClientResponse` that are used to
+    read a response.
+    """
+
+    __slots__ = (
+        "url",
+        "request_url",
+        "method",
+        "status",
+        "headers",
+        "body",
+        "stored_at",
+        "lifetime",
+        "vary",
+    )
+
+    def __init__(
+        self,
+        url: URL,
+        status: int,
+        headers: CIMultiDictProxy,
+        body: bytes,
+        *,
+        request_url: Optional[URL] = None,
+        method: str = "GET",
+        stored_at: float,
+        lifetime: float,
+        vary: Dict[str, Optional[str]],
+    ) -> None:
+        #: The URL of the response, after redirects.
+        self.url = url
+
+        #: The URL that was requested, before redirects.
+        self.request_url = request_url if request_url is not None else url
+
+        #: The method of the request.
+        self.method = method
+
+        #: The status code of the response.
+        self.status = status
+
+        #: The headers of the response.
+        self.headers = headers
+
+        #: The body of the response.
+        self.body = body
+
+        #: When the response was received or last revalidated, as a
+        #: :func:`time.time` value.
+        self.stored_at = stored_at
+
+        #: The number of seconds after :attr:`stored_at` that the response is
+        #: fresh for.
+        self.lifetime = lifetime
+
+        #: The values of the request headers named by the ``Vary`` header of
+        #: the response, keyed by lowercased name.
+        self.vary = vary
+
+    def __repr__(self) -> str:
+        return f"<CachedResponse url={str(self.url)!r} status={self.status}>"
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def fresh(self) -> bool:
+        """Return whether the response can be served without revalidating it."""
+        return time.time() - self.stored_at < self.lifetime
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """Return the headers to revalidate the response with."""
+        headers = {}
+        if "ETag" in self.headers:
+            headers["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["Last-Modified"]
+        return headers
+
+    @property
+    def request_info(self) -> aiohttp.RequestInfo:
+        """Return information about the request, like
+        :attr:`aiohttp.ClientResponse.request_info`. The request headers
+        aren't kept, so they are empty.
+        """
+        return aiohttp.RequestInfo(
+            self.request_url, self.method, CIMultiDictProxy(CIMultiDict()), self.url
+        )
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise aiohttp.ClientResponseError(
+                self.request_info,
+                (),
+                status=self.status,
+                message=responses.get(self.status, ""),
+                headers=self.headers,
+            )
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        if encoding is None:
+            mimetype = aiohttp.helpers.parse_mimetype(
+                self.headers.get("Content-Type", "")
+            )
+            encoding = mimetype.parameters.get("charset", "utf-8")
+        return self.body.decode(encoding)
+
+    async def json(self, *, loads=json.loads) -> Any:
+        return loads(await self.text())
+
+    def _to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": str(self.url),
+            "request_url": str(self.request_url),
+            "method": self.method,
+            "status": self.status,
+            "headers": list(self.headers.items()),
+            "stored_at": self.stored_at,
+            "lifetime": self.lifetime,
+            "vary": self.vary,
+        }
+
+    @classmethod
+    def _from_dict(cls, data: Dict[str, Any], body: bytes) -> "CachedResponse":
+        return cls(
+            URL(data["url"]),
+            data["status"],
+            CIMultiDictProxy(CIMultiDict(data["headers"])),
+            body,
+            # Older entries don't have these.
+            request_url=URL(data.get("request_url", data["url"])),
+            method=data.get("method", "GET"),
+            stored_at=data["stored_at"],
+            lifetime=data["lifetime"],
+            vary=data["vary"],
+        )
+
+
+class CachedSession:
+    """Wraps an :class:`aiohttp.ClientSession`, caching the responses to
+    ``GET`` requests made with :meth:`get`.
+
+    Responses are cached in memory, evicting the least recently used ones, and
+    optionally on disk too. How long responses are fresh for is determined
+    from their ``Cache-Control`` and ``Expires`` headers, falling back to
+    ``default_ttl``. Stale responses with an ``ETag`` or ``Last-Modified``
+    header are revalidated with a conditional request. Responses with
+    ``Cache-Control: no-store`` or ``Vary: *`` aren't cached.
+
+    Concurrent identical requests are collapsed into a single request.
+
+    Other methods are looked up on the wrapped session, so they aren't cached.
+
+    Example
+    -------
+
+    .. code:: python3
+
+        class Weather(lifesaver.Cog):
+            def __init__(self, bot):
+                super().__init__(bot)
+                self.api = CachedSession(self.session, name="weather")
+
+            @lifesaver.command()
+            async def weather(self, ctx, *, city):
+                resp = await self.api.get(API_URL, params={"q": city})
+                data = await resp.json()
+                ...
+
+    Parameters
+    ----------
+    session
+        The session to make requests with.
+    name
+        The name of the cache in :meth:`lifesaver.bot.BotBase.collect_metrics`.
+    max_entries
+        The maximum number of responses to keep in memory.
+    max_body_size
+        The size, in bytes, of the largest body that is cached.
+    directory
+        The directory to cache responses on disk in, which shouldn't be used for
+        anything else. Responses are only cached in memory if this isn't
+        specified.
+    default_ttl
+        The number of seconds that responses without freshness information are
+        fresh for.
+    """
+
+    # Every cache that has been created, so that their metrics can be
+    # collected.
+    _instances: "weakref.WeakSet[CachedSession]" = weakref.WeakSet()
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        name: Optional[str] = None,
+        max_entries: int = 1024,
+        max_body_size: int = 1024 ** 2,
+        directory: Optional[str] = None,
+        default_ttl: float = 0.0,
+    ) -> None:
+        #: The wrapped session.
+        self.session = session
+
+        self.name = name or f"cache-{id(self):x}"
+        self.max_entries = max_entries
+        self.max_body_size = max_body_size
+        self.directory = directory
+        self.default_ttl = default_ttl
+
+        #: The number of requests served from the cache without a request.
+        self.hits = 0
+
+        #: The number of requests that required a full response.
+        self.misses = 0
+
+        #: The number of stale responses that were revalidated and served.
+        self.revalidations = 0
+
+        #: The number of requests that waited for an identical request in flight.
+        self.collapsed = 0
+
+        #: The number of responses evicted from memory.
+        self.evictions = 0
+
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, Tuple], asyncio.Task] = {}
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        self._instances.add(self)
+
+    def __repr__(self) -> str:
+        return (
+            f"<CachedSession name={self.name!r} entries={len(self._entries)} "
+            f"hit_rate={self.hit_rate:.2f}>"
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.session, name)
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the fraction of requests that didn't need a full response:
+        those served from the cache, revalidated, or collapsed into another
+        request.
+        """
+        served = self.hits + self.revalidations + self.collapsed
+        total = served + self.misses
+        return served / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serializable representation of the cache's metrics."""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "collapsed": self.collapsed,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    async def get(
+        self,
+        url: Any,
+        *,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        refresh: bool = False,
+        **kwargs,
+    ) -> CachedResponse:
+        """Make a ``GET`` request, serving it from the cache if possible.
+
+        Parameters
+        ----------
+        url
+            The URL to request.
+        params
+            The query parameters to add to the URL.
+        headers
+            The headers to send.
+        refresh
+            Revalidate the cached response even if it is still fresh.
+        kwargs
+            Passed to :meth:`aiohttp.ClientSession.get`.
+        """
+        url = URL(url)
+        if params:
+            url = url.update_query(params)
+        headers = CIMultiDict(headers or {})
+        key = str(url)
+
+        entry = await self._lookup(key, headers)
+        if entry is not None and entry.fresh and not refresh:
+            self.hits += 1
+            return entry
+
+        # Identical requests are collapsed. The request is made in a separate
+        # task, so that it isn't cancelled along with the first requester.
+        inflight_key = (key, tuple(sorted(headers.items())))
+        task = self._inflight.get(inflight_key)
+        if task is not None:
+            self.collapsed += 1
+        else:
+            task = asyncio.ensure_future(self._fetch(key, url, headers, entry, kwargs))
+            self._inflight[inflight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self,
+        key: str,
+        url: URL,
+        headers: CIMultiDict,
+        entry: Optional[CachedResponse],
+        kwargs: Dict[str, Any],
+    ) -> CachedResponse:
+        request_headers = CIMultiDict(headers)
+        if entry is not None:
+            request_headers.update(entry.validators)
+
+        async with self.session.get(url, headers=request_headers, **kwargs) as resp:
+            now = time.time()
+
+            if resp.status == 304 and entry is not None:
+                self.revalidations += 1
+                # The 304 response carries updated caching headers.
+                merged = CIMultiDict(entry.headers)
+                for name in ("Cache-Control", "Expires", "Date", "ETag", "Age"):
+                    if name in resp.headers:
+                        merged[name] = resp.headers[name]
+                entry.headers = CIMultiDictProxy(merged)
+                entry.stored_at = now
+                entry.lifetime = _lifetime(merged, self.default_ttl)
+                await self._store(key, entry)
+                return entry
+
+            self.misses += 1
+            body = await resp.read()
+
+        vary = {
+            name.strip().lower(): headers.get(name.strip())
+            for name in resp.headers.get("Vary", "").split(",")
+            if name.strip()
+        }
+        response = CachedResponse(
+            resp.url,
+            resp.status,
+            resp.headers,
+            body,
+            request_url=url,
+            method=resp.method,
+            stored_at=now,
+            lifetime=_lifetime(resp.headers, self.default_ttl),
+            vary=vary,
+        )
+
+        if self._cacheable(response):
+            await self._store(key, response)
+
+        return response
+
+    def _cacheable(self, response: CachedResponse) -> bool:
+        if response.status not in CACHEABLE_STATUSES:
+            return False
+        if len(response.body) > self.max_body_size:
+            return False
+        if "no-store" in _directives(response.headers.get("Cache-Control")):
+            return False
+        if "*" in response.vary:
+            return False
+        # Responses that are never fresh are only useful if they can be
+        # revalidated.
+        return response.lifetime > 0 or bool(response.validators)
+
+    async def _lookup(self, key: str, headers: CIMultiDict) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.directory is not None:
+            entry = await asyncio.get_event_loop().run_in_executor(
+                None, self._read, key
+            )
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is None:
+            return None
+
+        # A response that varies on request headers only matches requests with
+        # the same values for them.
+        if any(headers.get(name) != value for (name, value) in entry.vary.items()):
+            return None
+
+        return entry
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _store(self, key: str, entry: CachedResponse) -> None:
+        self._remember(key, entry)
+        if self.directory is not None:
+            await asyncio.get_event_loop().run_in_executor(
+                None, self._write, key, entry
+            )
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def _read(self, key: str) -> Optional[CachedResponse]:
+        path = self._path(key)
+        try:
+            with open(path + ".json", "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+            with open(path + ".body", "rb") as fp:
+                body = fp.read()
+        except (OSError, ValueError):
+            return None
+
+        # Guard against hash collisions.
+        if data.get("key") != key:
+            return None
+
+        return CachedResponse._from_dict(data, body)
+
+    def _write(self, key: str, entry: CachedResponse) -> None:
+        path = self._path(key)
+        atomic_name = os.path.join(self.directory, f"{uuid.uuid4()}.tmp")
+
+        # The body is written first, so that metadata never refers to a body
+        # that doesn't exist.
+        with open(atomic_name, "wb") as fp:
+            fp.write(entry.body)
+        os.replace(atomic_name, path + ".body")
+
+        with open(atomic_name, "w", encoding="utf-8") as fp:
+            json.dump({"key": key, **entry._to_dict()}, fp)
+        os.replace(atomic_name, path + ".json")
+
+    def invalidate(self, url: Optional[Any] = None) -> None:
+        """Drop a URL from the cache, or every URL if none is specified.
+
+        Responses cached on disk are removed too.
+        """
+        if url is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(str(URL(url)), None)
+
+        if self.directory is None:
+            return
+
+        if url is None:
+            names = [
+                name
+                for name in os.listdir(self.directory)
+                if name.endswith((".json", ".body"))
+            ]
+        else:
+            digest = os.path.basename(self._path(str(URL(url))))
+            names = [digest + ".json", digest + ".body"]
+
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
@@ -1,7 +1,10 @@
 # encoding: utf-8
 
+import ast
 import importlib
+import json
 import logging
+import os
 import typing
 from collections import UserList
 from pathlib import Path
@@ -17,6 +20,19 @@ FORBIDDEN_EXTENSIONS = {
 }
 FORBIDDEN_NAMES = {"__pycache__"}
 
+#: The supported strategies for discovering extensions. See :meth:`LoadList.build`.
+DISCOVERY_MODES = {"import", "static"}
+
+#: The version of the load list manifest format. Manifests with a different
+#: version are ignored.
+MANIFEST_VERSION = 1
+
+Fingerprint = typing.Optional[typing.List[int]]
+
+# Maps an extension's source file to its fingerprint and whether it defines a
+# top-level ``setup``, so that unchanged files aren't reparsed.
+_setup_cache: typing.Dict[Path, typing.Tuple[typing.Tuple[int, int], bool]] = {}
+
 
 def transform_path(path: typing.Union[Path, str]) -> str:
     return str(path).replace("/", ".").replace(".py", "")
@@ -35,6 +51,118 @@ def filter_path(path: typing.Union[Path, str]) -> bool:
     return True
 
 
+def extension_source(path: Path) -> typing.Optional[Path]:
+    """Return the source file of a candidate extension path.
+
+    Single file extensions resolve to themselves, and extension modules resolve
+    to their ``__init__.py``. ``None`` is returned if the path can't be an
+    extension.
+    """
+    if path.is_dir():
+        init = path / "__init__.py"
+        return init if init.is_file() else None
+
+    if path.suffix == ".py":
+        return path
+
+    return None
+
+
+def manifest_path(exts_path: Path) -> Path:
+    """Return the path of the load list manifest for an extensions path.
+
+    The manifest is kept next to the extensions directory (not inside of it),
+    so that it isn't mistaken for an extension or picked up by the hot reloader.
+    """
+    resolved = exts_path.resolve()
+    return resolved.parent / f".{resolved.name}.manifest.json"
+
+
+def _fingerprint(path: Path) -> Fingerprint:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _fingerprint_target(candidate: Path) -> Path:
+    # For extension modules, the presence and contents of __init__.py is what
+    # decides whether it's an extension.
+    return candidate / "__init__.py" if candidate.is_dir() else candidate
+
+
+def _binds_setup(nodes: typing.Iterable[ast.stmt]) -> bool:
+    for node in nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name == "setup":
+                return True
+        elif isinstance(node, ast.Assign):
+            if any(
+                isinstance(target, ast.Name) and target.id == "setup"
+                for target in node.targets
+            ):
+                return True
+        elif isinstance(node, ast.ImportFrom):
+            if any((alias.asname or alias.name) == "setup" for alias in node.names):
+                return True
+        elif isinstance(node, ast.If):
+            if _binds_setup(node.body) or _binds_setup(node.orelse):
+                return True
+        elif isinstance(node, ast.Try):
+            if _binds_setup(node.body) or any(
+                _binds_setup(handler.body) for handler in node.handlers
+            ):
+                return True
+
+    return False
+
+
+def _imported_modules(nodes: typing.Iterable[ast.stmt]) -> typing.Set[str]:
+    modules: typing.Set[str] = set()
+
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            # Relative imports are skipped, they belong to the extension itself.
+            if node.level == 0 and node.module is not None:
+                modules.add(node.module)
+        elif isinstance(node, ast.If):
+            modules |= _imported_modules(node.body) | _imported_modules(node.orelse)
+        elif isinstance(node, ast.Try):
+            modules |= _imported_modules(node.body)
+
+    return modules
+
+
+def scan_imports(source: Path) -> typing.Set[str]:
+    """Return the absolute module names that a Python source file imports at the
+    top level, without importing it.
+    """
+    tree = ast.parse(source.read_bytes(), filename=str(source))
+    return _imported_modules(tree.body)
+
+
+def has_setup(source: Path) -> bool:
+    """Return whether a Python source file binds ``setup`` at the top level.
+
+    This is determined by parsing the file instead of importing it. Results are
+    cached according to the file's modification time and size.
+    """
+    stat = source.stat()
+    fingerprint = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _setup_cache.get(source)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    tree = ast.parse(source.read_bytes(), filename=str(source))
+    result = _binds_setup(tree.body)
+    _setup_cache[source] = (fingerprint, result)
+    return result
+
+
 class LoadList(UserList):
     """A class that encompasses behavior related to discovering extensions and loading them."""
 
@@ -42,39 +170,169 @@ class LoadList(UserList):
         super().__init__(*args, **kwargs)
         self.log = logging.getLogger(__name__)
 
-    def build(self, exts_path: Path):
+    def _read_manifest(
+        self, manifest: Path, exts_path: Path, discovery: str
+    ) -> typing.Optional[typing.List[str]]:
+        """Return the extensions recorded in a manifest if it's still valid.
+
+        Validation only consists of ``stat`` calls: the extensions directory
+        itself (which catches additions, removals, and renames) and every
+        candidate source file that was considered when the manifest was written.
+        """
+        try:
+            with open(manifest, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            self.log.warning("Ignoring unreadable load list manifest at %s.", manifest)
+            return None
+
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != MANIFEST_VERSION
+            or data.get("discovery") != discovery
+            or data.get("directory") != _fingerprint(exts_path)
+        ):
+            return None
+
+        sources = data.get("sources", {})
+        for source, fingerprint in sources.items():
+            if _fingerprint(Path(source)) != fingerprint:
+                self.log.debug("%s has changed, load list manifest is stale.", source)
+                return None
+
+        return data.get("extensions")
+
+    def _write_manifest(
+        self,
+        manifest: Path,
+        exts_path: Path,
+        discovery: str,
+        candidates: typing.List[Path],
+    ) -> None:
+        data = {
+            "version": MANIFEST_VERSION,
+            "discovery": discovery,
+            "directory": _fingerprint(exts_path),
+            "sources": {
+                str(target): _fingerprint(target)
+                for target in map(_fingerprint_target, candidates)
+            },
+            "extensions": self.data,
+        }
+
+        atomic_name = manifest.with_name(manifest.name + ".tmp")
+
+        try:
+            with open(atomic_name, "w", encoding="utf-8") as fp:
+                json.dump(data, fp, indent=2)
+            os.replace(atomic_name, manifest)
+        except OSError:
+            self.log.warning(
+                "Failed to write load list manifest to %s.", manifest, exc_info=True
+            )
+
+    def build(
+        self,
+        exts_path: Path,
+        *,
+        discovery: str = "import",
+        manifest: typing.Optional[Path] = None,
+    ):
+        """Discover the extensions in a directory and replace the load list with them.
+
+        Parameters
+        ----------
+        exts_path
+            The directory to search for extensions in.
+        discovery
+            How to decide whether a candidate is an extension. ``import``
+            imports every candidate and checks for a ``setup`` attribute.
+            ``static`` parses every candidate's source for a top-level
+            ``setup`` instead, which avoids importing anything.
+        manifest
+            A path to persist the discovered extensions to. If the manifest
+            exists and nothing in ``exts_path`` has changed since it was
+            written, its extensions are used without discovering anything.
+            Otherwise, the load list is rebuilt and the manifest is rewritten,
+            unless a candidate failed to be discovered. The cause of the failure
+            (e.g. a missing dependency) might not show up in the manifest's
+            fingerprints, so it's discovered again next time.
+        """
+        if discovery not in DISCOVERY_MODES:
+            raise ValueError(f"Unknown extension discovery mode: {discovery!r}")
+
         if not exts_path.is_dir():
             self.log.warning(
                 "Cannot build load list: %s is not a directory.", exts_path
             )
             return
 
-        # Build a list of extensions to load.
-        paths = [
-            transform_path(path) for path in exts_path.iterdir() if filter_path(path)
-        ]
+        if manifest is not None:
+            cached = self._read_manifest(manifest, exts_path, discovery)
+            if cached is not None:
+                self.log.debug("Using load list manifest at %s.", manifest)
+                self.data = cached
+                return
+
+        candidates = [path for path in exts_path.iterdir() if filter_path(path)]
+        failed: typing.List[str] = []
+
+        def handle_failure(path: str) -> bool:
+            failed.append(path)
+
+            # Failed to import, extension might be bugged.
+            # If this extension was previously included, retain it in the
+            # load list because it might be fixed and reloaded later.
+            #
+            # Otherwise, discard.
+            previously_included = path in self.data
+            if not previously_included:
+                self.log.exception("Excluding %s from the load list:", path)
+            else:
+                self.log.warning(
+                    (
+                        "%s has failed to load, but it will be retained in "
+                        "the load list because it was previously included."
+                    ),
+                    path,
+                )
+            return previously_included
 
-        def ext_filter(path: str) -> bool:
+        def import_filter(candidate: Path) -> bool:
+            path = transform_path(candidate)
             try:
                 module = importlib.import_module(path)
                 return hasattr(module, "setup")
             except Exception:
-                # Failed to import, extension might be bugged.
-                # If this extension was previously included, retain it in the
-                # load list because it might be fixed and reloaded later.
-                #
-                # Otherwise, discard.
-                previously_included = path in self.data
-                if not previously_included:
-                    self.log.exception("Excluding %s from the load list:", path)
-                else:
-                    self.log.warning(
-                        (
-                            "%s has failed to load, but it will be retained in "
-                            "the load list because it was previously included."
-                        ),
-                        path,
-                    )
-                return previously_included
-
-        self.data = list(filter(ext_filter, paths))
+                return handle_failure(path)
+
+        def static_filter(candidate: Path) -> bool:
+            source = extension_source(candidate)
+            if source is None:
+                self.log.debug("%s has no Python source, skipping.", candidate)
+                return False
+
+            try:
+                return has_setup(source)
+            except (SyntaxError, ValueError, OSError):
+                return handle_failure(transform_path(candidate))
+
+        ext_filter = static_filter if discovery == "static" else import_filter
+        self.data = [
+            transform_path(candidate)
+            for candidate in candidates
+            if ext_filter(candidate)
+        ]
+
+        if manifest is None:
+            return
+
+        if failed:
+            self.log.debug(
+                "Not writing the load list manifest, %s failed to be discovered.",
+                ", ".join(failed),
+            )
+        else:
+            self._write_manifest(manifest, exts_path, discovery, candidates)
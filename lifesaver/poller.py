@@ -231,13 +231,25 @@ class PollerPlug:
         for deleted in event["deleted"]:
             module = self.resolve_module(deleted, resolve_subfiles=True)
 
-            if module is not None and module in self.bot.extensions:
+            if module is not None and module in self.bot.lazy_extensions:
+                log.info("discarding deleted deferred extension %s", module)
+                self.bot.lazy_extensions.discard(module)
+            elif module is not None and module in self.bot.extensions:
                 log.info("unloading deleted extension %s", module)
                 self.bot.unload_extension(module)
 
         # reload updated extensions
         for updated in event["updated"]:
             module = self.resolve_module(updated)
+
+            if module in self.bot.lazy_extensions:
+                # it hasn't been loaded yet, so just rescan it.
+                log.info("rescanning deferred extension %s", module)
+                if not self.bot.lazy_extensions.register(module):
+                    self.bot.lazy_extensions.discard(module)
+                    self.try_load(module)
+                continue
+
             log.info("reloading extension %s", module)
 
             self.bot.reload_extension(module)
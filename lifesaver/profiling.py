@@ -0,0 +1,293 @@
+# encoding: utf-8
+
+"""Startup profiling."""
+
+__all__ = ["StartupProfiler"]
+
+import contextlib
+import importlib.abc
+import json
+import sys
+import threading
+import time
+import typing as T
+
+from lifesaver.utils.timing import format_seconds
+
+TraceEvent = T.Dict[str, T.Any]
+
+
+class _TimedLoader:
+    """Stands in for the loader of a single module spec, timing the execution
+    of the module. Everything else is delegated to the real loader, which is
+    put back once the module has been executed.
+    """
+
+    def __init__(self, timer: "_ImportTimer", fullname: str, loader) -> None:
+        self.timer = timer
+        self.fullname = fullname
+        self.loader = loader
+
+    def __getattr__(self, name: str) -> T.Any:
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        create_module = getattr(self.loader, "create_module", None)
+        return create_module(spec) if create_module is not None else None
+
+    def exec_module(self, module) -> None:
+        try:
+            self.timer.timed_exec(self.fullname, self.loader.exec_module, module)
+        finally:
+            # Don't leave the proxy behind on the module.
+            module.__loader__ = self.loader
+            if getattr(module, "__spec__", None) is not None:
+                module.__spec__.loader = self.loader
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """A meta path finder that times the execution of every module imported
+    after it has been installed.
+
+    It doesn't find anything by itself. Instead, it asks the rest of the meta
+    path for the spec and gives it a :class:`_TimedLoader` in place of its
+    loader, so loaders that are shared between modules aren't modified.
+    """
+
+    def __init__(self, profiler: "StartupProfiler") -> None:
+        self.profiler = profiler
+        # Imports can happen on several threads at once (e.g. when warming up
+        # extensions), each with its own stack of modules being executed.
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> T.List[T.List[float]]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+
+            loader = spec.loader
+            # Builtin and frozen importers are classes; leave those alone.
+            if (
+                loader is not None
+                and not isinstance(loader, type)
+                and hasattr(loader, "exec_module")
+            ):
+                spec.loader = _TimedLoader(self, fullname, loader)
+
+            return spec
+
+        return None
+
+    def timed_exec(self, fullname: str, exec_module, module) -> None:
+        # Keep track of the time spent importing children, so that the time
+        # spent executing this module itself can be calculated.
+        stack = self._stack
+        frame = [0.0]
+        stack.append(frame)
+        start = time.perf_counter()
+
+        try:
+            exec_module(module)
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += duration
+
+            self.profiler.record(
+                fullname,
+                start,
+                duration,
+                category="import",
+                self_time=duration - frame[0],
+            )
+
+
+class StartupProfiler:
+    """Records a timeline of what happens while a bot starts up.
+
+    Spans of time are recorded with :meth:`span` (or :meth:`begin` and
+    :meth:`end`), and points in time with :meth:`mark`. When
+    :meth:`install_import_hook` is used, the time spent executing every
+    imported module is recorded as well.
+
+    The timeline can be summarized with :meth:`report` or exported in the
+    `Trace Event Format`_ with :meth:`to_trace`, which can be viewed in
+    ``chrome://tracing`` or Perfetto.
+
+    .. _Trace Event Format: https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+    """
+
+    def __init__(self, *, output: T.Optional[str] = None) -> None:
+        #: The path to export the trace to when finished, if any.
+        self.output = output
+
+        #: Whether :meth:`finish` has been called.
+        self.finished = False
+
+        self.origin = time.perf_counter()
+        self.events: T.List[TraceEvent] = []
+        self._open: T.Dict[str, float] = {}
+        self._import_timer: T.Optional[_ImportTimer] = None
+
+    def __repr__(self) -> str:
+        return f"<StartupProfiler events={len(self.events)} output={self.output!r}>"
+
+    def _timestamp(self, moment: float) -> float:
+        return (moment - self.origin) * 1_000_000
+
+    def record(
+        self,
+        name: str,
+        start: float,
+        duration: float,
+        *,
+        category: str = "startup",
+        **args: T.Any,
+    ) -> None:
+        """Record a span that started at a :func:`time.perf_counter` value."""
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": self._timestamp(start),
+                "dur": duration * 1_000_000,
+                "pid": 0,
+                "tid": 0,
+                "args": args,
+            }
+        )
+
+    def mark(self, name: str, *, category: str = "startup") -> None:
+        """Record a point in time."""
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "i",
+                "s": "g",
+                "ts": self._timestamp(time.perf_counter()),
+                "pid": 0,
+                "tid": 0,
+            }
+        )
+
+    def begin(self, name: str) -> None:
+        """Begin a span that is ended later with :meth:`end`."""
+        self._open[name] = time.perf_counter()
+
+    def end(self, name: str, *, category: str = "startup", **args: T.Any) -> None:
+        """End a span started with :meth:`begin`. Does nothing if it wasn't begun."""
+        start = self._open.pop(name, None)
+        if start is not None:
+            self.record(
+                name, start, time.perf_counter() - start, category=category, **args
+            )
+
+    @contextlib.contextmanager
+    def span(self, name: str, *, category: str = "startup", **args: T.Any):
+        """A context manager that records the time spent inside of it.
+
+        The span's arguments are yielded as a dict, which can be updated to
+        attach values that are only known once the span has begun.
+        """
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.record(
+                name, start, time.perf_counter() - start, category=category, **args
+            )
+
+    def install_import_hook(self) -> None:
+        """Start recording the time spent executing imported modules."""
+        if self._import_timer is None:
+            self._import_timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._import_timer)
+
+    def uninstall_import_hook(self) -> None:
+        """Stop recording the time spent executing imported modules."""
+        if self._import_timer is not None:
+            sys.meta_path.remove(self._import_timer)
+            self._import_timer = None
+
+    def imports(self) -> T.Dict[str, TraceEvent]:
+        """Return the recorded import events, keyed by module name."""
+        return {
+            event["name"]: event for event in self.events if event["cat"] == "import"
+        }
+
+    def to_trace(self) -> T.Dict[str, T.Any]:
+        """Return the timeline in the Trace Event Format."""
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str) -> None:
+        """Write the timeline to a file in the Trace Event Format."""
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(self.to_trace(), fp)
+
+    def report(self, *, imports: int = 15) -> str:
+        """Return a human readable summary of the timeline.
+
+        Parameters
+        ----------
+        imports
+            The number of slowest imports (by self time) to include.
+        """
+        lines = ["Startup timeline:"]
+
+        for event in sorted(self.events, key=lambda event: event["ts"]):
+            if event["cat"] == "import":
+                continue
+
+            at = format_seconds(event["ts"] / 1_000_000)
+            if event["ph"] == "i":
+                lines.append(f"  {at:>10}  * {event['name']}")
+                continue
+
+            took = format_seconds(event["dur"] / 1_000_000)
+            details = "".join(
+                f", {key}: {format_seconds(value)}"
+                for (key, value) in event["args"].items()
+                if isinstance(value, float)
+            )
+            lines.append(f"  {at:>10}  {event['name']} ({took}{details})")
+
+        slowest = sorted(
+            self.imports().values(),
+            key=lambda event: event["args"]["self_time"],
+            reverse=True,
+        )[:imports]
+
+        if slowest:
+            lines.append("Slowest imports (self, cumulative):")
+            for event in slowest:
+                self_time = format_seconds(event["args"]["self_time"])
+                cumulative = format_seconds(event["dur"] / 1_000_000)
+                lines.append(f"  {self_time:>10}  {cumulative:>10}  {event['name']}")
+
+        return "\n".join(lines)
+
+    def finish(self) -> str:
+        """Stop profiling, export the trace if :attr:`output` is set, and return
+        the report.
+        """
+        self.finished = True
+        self.uninstall_import_hook()
+
+        if self.output is not None:
+            self.export(self.output)
+
+        return self.report()
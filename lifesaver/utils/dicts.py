@@ -1,9 +1,9 @@
 # encoding: utf-8
 
-__all__ = ["merge_dicts", "dot_access"]
+__all__ = ["merge_dicts", "dot_access", "flatten_dict"]
 
 import collections
-from typing import Any, Mapping, MutableMapping
+from typing import Any, Dict, Mapping, MutableMapping
 
 
 def merge_dicts(
@@ -26,3 +26,23 @@ def dot_access(source: Mapping[Any, Any], access: str) -> Any:
     for part in access.split("."):
         item = item[part]
     return item
+
+
+def flatten_dict(source: Mapping[Any, Any], *, separator: str = ".") -> Dict[str, Any]:
+    """Flatten a nested mapping into a dict keyed by dotted strings.
+
+    The keys of the result are the same strings that would be passed to
+    :func:`dot_access` to access each value.
+    """
+    flattened = {}
+
+    for key, value in source.items():
+        if isinstance(value, collections.abc.Mapping):
+            for inner_key, inner_value in flatten_dict(
+                value, separator=separator
+            ).items():
+                flattened[f"{key}{separator}{inner_key}"] = inner_value
+        else:
+            flattened[str(key)] = value
+
+    return flattened
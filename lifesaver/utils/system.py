@@ -26,9 +26,12 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-__all__ = ["shell"]
+__all__ = ["shell", "memory_usage"]
 
 import asyncio
+import os
+import sys
+from typing import Optional
 
 
 async def shell(command: str) -> str:
@@ -38,3 +41,25 @@ async def shell(command: str) -> str:
     )
     results = await shell.communicate()
     return "".join(x.decode() for x in results)
+
+
+def memory_usage() -> Optional[int]:
+    """Return the resident memory of this process in bytes, if it can be found.
+
+    On platforms without ``/proc``, the peak resident memory is returned
+    instead.
+    """
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, everything else reports kilobytes.
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -26,8 +26,9 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-__all__ = ["Timer", "format_seconds", "Ratelimiter"]
+__all__ = ["Timer", "format_seconds", "Ratelimiter", "Histogram"]
 
+import bisect
 import time
 import typing as T
 
@@ -156,3 +157,110 @@ class Ratelimiter:
             and self.rate == other.rate
             and self.per == other.per
         )
+
+
+#: The default bucket bounds of :class:`Histogram`, in seconds.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+
+
+class Histogram:
+    """A histogram of durations with fixed buckets.
+
+    Recording a value only increments a counter, so it is cheap enough to do on
+    every command invocation. Quantiles are estimated from the buckets, and are
+    therefore only as precise as the bucket bounds.
+
+    Example
+    -------
+
+    .. code:: python3
+
+        histogram = Histogram()
+
+        with Timer() as timer:
+            ...
+
+        histogram.record(timer.duration)
+        histogram.quantile(0.99)
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: T.Sequence[float] = DEFAULT_BUCKETS) -> None:
+        #: The upper bounds (inclusive) of the buckets, in ascending order. An
+        #: additional bucket holds values larger than the last bound.
+        self.bounds = tuple(bounds)
+
+        #: The number of values recorded in each bucket.
+        self.counts = [0] * (len(self.bounds) + 1)
+
+        #: The number of values recorded.
+        self.count = 0
+
+        #: The sum of all values recorded.
+        self.total = 0.0
+
+        #: The largest value recorded.
+        self.max = 0.0
+
+    def __repr__(self) -> str:
+        return f"<Histogram count={self.count} mean={self.mean:.6f} max={self.max:.6f}>"
+
+    def record(self, value: float) -> None:
+        """Record a value."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        """Return the mean of all recorded values."""
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile (e.g. ``0.99``) as the upper bound of the bucket it
+        falls in. Values past the last bound are estimated as :attr:`max`.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+
+        return self.max
+
+    def to_dict(self) -> T.Dict[str, T.Any]:
+        """Return a JSON serializable representation of the histogram."""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "buckets": {
+                str(bound): count
+                for (bound, count) in zip(self.bounds + ("+Inf",), self.counts)
+            },
+        }